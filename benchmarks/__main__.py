@@ -0,0 +1,61 @@
+import argparse
+import fnmatch
+import json
+import platform
+import sys
+import time
+
+from . import dispatch, protocol, readpath  # noqa: F401, registers the benchmarks
+from .harness import BENCHMARKS, measure
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="bmd-hid-device benchmarks")
+    parser.add_argument("patterns", nargs="*", default=["*"], help="glob patterns of benchmarks to run")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against results previously written with --json")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed slowdown relative to the baseline before failing")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if not any(fnmatch.fnmatch(name, pattern) for pattern in args.patterns):
+            continue
+        try:
+            result = measure(name, setup, args.repeat)
+        except ImportError as e:
+            print("{0:<40} skipped, {1}".format(name, e))
+            continue
+        results[name] = result._asdict()
+        print("{0:<40} {1:>12.1f} ns/op {2:>14.0f} op/s".format(name, result.ns_per_op, result.ops_per_sec))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "time": time.time(),
+                "results": results,
+            }, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            ratio = result["ns_per_op"] / baseline[name]["ns_per_op"]
+            if ratio > 1 + args.tolerance:
+                regressions.append((name, ratio))
+        for name, ratio in regressions:
+            print("REGRESSION {0}: {1:.2f}x slower than baseline".format(name, ratio), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import argparse
+import multiprocessing
+import os
+import selectors
+import socket
+import tempfile
+import time
+
+from bmd_hid_device.bridge import DeviceBridge, FrameKind, read_frames
+from bmd_hid_device.emulator import SpeedEditorEmulator
+from bmd_hid_device.protocol.events import OnJogEvent
+from bmd_hid_device.rawdevice import BmdRawDevice
+
+
+# The bridge runs in its own process with one emulated device, which starts
+# generating jog reports once all clients are connected
+def serve(path: str, clients: int, rate: float, count: int, ready):
+    emulator = SpeedEditorEmulator(seed=0)
+    bridge = DeviceBridge(path, max_buffer=1 << 22)
+    bridge.add(BmdRawDevice(emulator.device_info(), auto_refresh=False, transport=emulator))
+    ready.set()
+    while bridge.clients() < clients:
+        bridge.serve(1)
+    emulator.generate(rate, count, kinds=(OnJogEvent,))
+    idle_since = None
+    while bridge.clients():
+        bridge.serve(1)
+        if emulator.reads < count:
+            continue
+        if idle_since is None:
+            idle_since = time.monotonic()
+        elif time.monotonic() - idle_since > 1:
+            break
+    bridge.close()
+
+
+def run(clients: int, rate: float, count: int) -> tuple[float, int]:
+    path = os.path.join(tempfile.mkdtemp(), "bridge.sock")
+    context = multiprocessing.get_context("spawn")
+    ready = context.Event()
+    server = context.Process(target=serve, args=(path, clients, rate, count, ready))
+    server.start()
+    ready.wait()
+    selector = selectors.DefaultSelector()
+    buffers = {}
+    for _ in range(clients):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(path)
+        sock.setblocking(False)
+        buffers[sock] = bytearray()
+        selector.register(sock, selectors.EVENT_READ)
+
+    received = 0
+    first = last = None
+    while received < clients * count and buffers:
+        for key, _ in selector.select(5):
+            data = key.fileobj.recv(1 << 16)
+            if not data:
+                selector.unregister(key.fileobj)
+                del buffers[key.fileobj]
+                continue
+            buffer = buffers[key.fileobj]
+            buffer += data
+            for kind, _, _ in read_frames(buffer):
+                if kind == FrameKind.INPUT:
+                    received += 1
+                    last = time.monotonic_ns()
+                    if first is None:
+                        first = last
+    for sock in list(buffers):
+        sock.close()
+    server.join()
+    elapsed = (last - first) / 1e9 if first is not None and last > first else float("nan")
+    return received / elapsed, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeviceBridge fan-out throughput by client count")
+    parser.add_argument("--rate", type=float, default=5000, help="reports per second")
+    parser.add_argument("--count", type=int, default=5000, help="reports sent")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    print("{0:>8} {1:>10} {2:>10} {3:>14}".format("clients", "frames", "lost", "frames/s"))
+    for clients in args.clients:
+        throughput, received = run(clients, args.rate, args.count)
+        print("{0:>8} {1:>10} {2:>10} {3:>14.0f}".format(
+            clients, received, clients * args.count - received, throughput))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import itertools
+from typing import Optional
+
+from bmd_hid_device.batch import EventBatch
+from bmd_hid_device.emulator import SpeedEditorEmulator
+from bmd_hid_device.hiddevice import BmdHidDevice
+from bmd_hid_device.inputhandler import InputEventHandler
+from bmd_hid_device.ledstatehandler import LedStateHandler
+from bmd_hid_device.protocol.events import OnJogEvent, OnKeyEvent, OnBatteryEvent
+from bmd_hid_device.protocol.keymask import key_mask
+from bmd_hid_device.protocol.types import BmdHidJogMode, BmdHidKey, BmdHidLed
+from bmd_hid_device.rawdevice import BmdRawDevice
+from .harness import benchmark
+
+# Modifier-heavy editing: ripple trims, in/out marking and camera switching
+# while a modifier is held
+CHORDS = [
+    [],
+    [BmdHidKey.TRIM_IN],
+    [BmdHidKey.TRIM_IN, BmdHidKey.RIPL_DEL],
+    [BmdHidKey.TRIM_IN],
+    [],
+    [BmdHidKey.IN],
+    [],
+    [BmdHidKey.OUT],
+    [BmdHidKey.OUT, BmdHidKey.SMART_INSRT],
+    [],
+    [BmdHidKey.LIVE_OWR],
+    [BmdHidKey.LIVE_OWR, BmdHidKey.CAM1],
+    [BmdHidKey.LIVE_OWR],
+    [BmdHidKey.LIVE_OWR, BmdHidKey.CAM2],
+    [BmdHidKey.LIVE_OWR, BmdHidKey.CAM2, BmdHidKey.CAM3],
+    [BmdHidKey.LIVE_OWR],
+    [],
+]
+
+CAMS = [BmdHidLed.CAM1, BmdHidLed.CAM2, BmdHidLed.CAM3, BmdHidLed.CAM4, BmdHidLed.CAM5,
+        BmdHidLed.CAM6, BmdHidLed.CAM7, BmdHidLed.CAM8, BmdHidLed.CAM9]
+
+
+def _ignore(*args):
+    pass
+
+
+@benchmark("input.update_chords")
+def update_chords():
+    handler = InputEventHandler(_ignore, _ignore)
+    chords = [set(chord) for chord in CHORDS]
+
+    def run():
+        for chord in chords:
+            handler.update(chord)
+
+    return run
+
+
+@benchmark("input.update_mask_chords")
+def update_mask_chords():
+    handler = InputEventHandler(_ignore, _ignore)
+    chords = [key_mask(*chord) for chord in CHORDS]
+
+    def run():
+        for chord in chords:
+            handler.update_mask(chord)
+
+    return run
+
+
+@benchmark("leds.single")
+def leds_single():
+    leds = LedStateHandler(_ignore, _ignore)
+    cams = itertools.cycle(CAMS)
+
+    def run():
+        cam = next(cams)
+        leds.on(cam)
+        leds.off(cam)
+
+    return run
+
+
+@benchmark("leds.batch")
+def leds_batch():
+    leds = LedStateHandler(_ignore, _ignore)
+    cams = itertools.cycle(CAMS)
+
+    def run():
+        with leds:
+            for cam in CAMS:
+                leds.off(cam)
+            leds.on(next(cams))
+
+    return run
+
+
+# Hands out a fixed cycle of reports as fast as they are read, the
+# authentication handshake is answered by the emulator
+class CyclingTransport(SpeedEditorEmulator):
+    def __init__(self, reports: list[bytes]):
+        super().__init__("BENCH")
+        self._reports = itertools.cycle(reports)
+
+    def read(self, size: int, timeout: Optional[int] = None) -> bytes:
+        return next(self._reports)
+
+
+class NullDevice(BmdHidDevice):
+    def on_jog_event(self, mode: BmdHidJogMode, value: int):
+        pass
+
+    def on_key_down(self, key: BmdHidKey):
+        pass
+
+    def on_key_up(self, key: BmdHidKey):
+        pass
+
+    def on_battery(self, charging: bool, level: int):
+        pass
+
+
+def _poll(reports: list[bytes]):
+    transport = CyclingTransport(reports)
+    device = NullDevice(transport.device_info(), BmdRawDevice(transport.device_info(), auto_refresh=False, transport=transport))
+    return lambda: device.poll(0)
+
+
+@benchmark("poll.jog")
+def poll_jog():
+    return _poll([OnJogEvent(BmdHidJogMode.RELATIVE, value).serialize() for value in (1, -1, 2, -2)])
+
+
+@benchmark("poll.keys")
+def poll_keys():
+    return _poll([OnKeyEvent(chord).serialize() for chord in CHORDS])
+
+
+@benchmark("poll.mixed")
+def poll_mixed():
+    return _poll(_mixed_reports())
+
+
+def _mixed_reports() -> list[bytes]:
+    reports = [OnJogEvent(BmdHidJogMode.RELATIVE, 1).serialize()] * 8
+    reports += [OnKeyEvent(chord).serialize() for chord in CHORDS[:4]]
+    reports.append(OnBatteryEvent(False, 80).serialize())
+    return reports
+
+
+# One operation is a batch of 64 reports, compare with 64 times poll.mixed
+def _poll_batch(dispatch: bool):
+    transport = CyclingTransport(_mixed_reports())
+    device = NullDevice(transport.device_info(), BmdRawDevice(transport.device_info(), auto_refresh=False, transport=transport))
+    batch = EventBatch(64)
+
+    def run():
+        batch.clear()
+        device.poll_batch(batch)
+        if dispatch:
+            device.dispatch_batch(batch)
+
+    return run
+
+
+@benchmark("poll.batch64.mixed")
+def poll_batch_mixed():
+    return _poll_batch(False)
+
+
+@benchmark("poll.batch64.dispatch.mixed")
+def poll_batch_dispatch_mixed():
+    return _poll_batch(True)
@@ -0,0 +1,32 @@
+import timeit
+from typing import Callable, NamedTuple
+
+Setup = Callable[[], Callable[[], object]]
+
+BENCHMARKS: dict[str, Setup] = {}
+
+
+class Result(NamedTuple):
+    name: str
+    ns_per_op: float
+    ops_per_sec: float
+    loops: int
+
+
+# Registers a benchmark. The decorated function does any setup and returns the
+# callable that is timed; it is called once per operation.
+def benchmark(name: str):
+    def register(setup: Setup) -> Setup:
+        if name in BENCHMARKS:
+            raise Exception("Duplicate benchmark {0}".format(name))
+        BENCHMARKS[name] = setup
+        return setup
+
+    return register
+
+
+def measure(name: str, setup: Setup, repeat: int = 5) -> Result:
+    timer = timeit.Timer(setup())
+    loops, _ = timer.autorange()
+    best = min(timer.repeat(repeat, loops)) / loops
+    return Result(name, best * 1_000_000_000, 1 / best, loops)
@@ -0,0 +1,54 @@
+import argparse
+import collections
+import statistics
+import time
+
+from bmd_hid_device.emulator import SpeedEditorEmulator
+from bmd_hid_device.hub import DeviceHub
+from bmd_hid_device.protocol.events import OnJogEvent
+from bmd_hid_device.protocol.types import BmdHidJogMode
+from bmd_hid_device.rawdevice import BmdRawDevice
+
+
+# Every emulated device releases one jog report per period, so the time at
+# which report i became available is start + i * period
+def run(devices: int, rate: float, count: int) -> list[int]:
+    hub = DeviceHub()
+    period = 1 / rate
+    start = time.monotonic_ns() + 50_000_000
+    for i in range(devices):
+        emulator = SpeedEditorEmulator("BENCH{0:02d}".format(i), seed=i)
+        hub.add(BmdRawDevice(emulator.device_info(), auto_refresh=False, transport=emulator))
+        emulator.script([(j * period, OnJogEvent(BmdHidJogMode.RELATIVE, 1)) for j in range(count)], start)
+    latencies = []
+    delivered = collections.Counter()
+    while sum(delivered.values()) < devices * count:
+        for event in hub.poll(10):
+            now = time.monotonic_ns()
+            latencies.append(now - start - int(delivered[event.serial] * period * 1_000_000_000))
+            delivered[event.serial] += 1
+    hub.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeviceHub per-event latency by device count")
+    parser.add_argument("--rate", type=float, default=1000, help="reports per second and device")
+    parser.add_argument("--count", type=int, default=2000, help="reports per device")
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    print("{0:>8} {1:>8} {2:>10} {3:>10} {4:>10}".format("devices", "events", "mean us", "p50 us", "p99 us"))
+    for devices in args.devices:
+        latencies = sorted(run(devices, args.rate, args.count))
+        print("{0:>8} {1:>8} {2:>10.1f} {3:>10.1f} {4:>10.1f}".format(
+            devices,
+            len(latencies),
+            statistics.fmean(latencies) / 1000,
+            latencies[len(latencies) // 2] / 1000,
+            latencies[len(latencies) * 99 // 100] / 1000,
+        ))
+
+
+if __name__ == "__main__":
+    main()
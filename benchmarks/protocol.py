@@ -0,0 +1,81 @@
+import random
+
+from bmd_hid_device.protocol import crypto
+from bmd_hid_device.protocol.events import OnJogEvent, OnKeyEvent, OnBatteryEvent, OnInputEvents
+from bmd_hid_device.protocol.features import AuthFeatureMessage, SerialFeatureMessage, DeviceFeatureMessages
+from bmd_hid_device.protocol.requests import SetLedRequest, SetJogModeRequest, SetJogLedRequest, SetConfigRequests
+from bmd_hid_device.protocol.types import BmdHidJogMode, BmdHidKey, BmdHidLed, BmdHidJogLed, BmdHidHandshakeStep
+from bmd_hid_device.util.messagehandler import MessageHandler
+from .harness import benchmark
+
+SAMPLES = [
+    (OnInputEvents, OnJogEvent(BmdHidJogMode.RELATIVE, -12)),
+    (OnInputEvents, OnKeyEvent([BmdHidKey.IN, BmdHidKey.OUT, BmdHidKey.CAM1])),
+    (OnInputEvents, OnBatteryEvent(True, 87)),
+    (SetConfigRequests, SetLedRequest(BmdHidLed.CUT | BmdHidLed.CAM1 | BmdHidLed.AUDIO_ONLY)),
+    (SetConfigRequests, SetJogModeRequest(BmdHidJogMode.ABSOLUTE_DEADZONE, 0)),
+    (SetConfigRequests, SetJogLedRequest(BmdHidJogLed.SHTL)),
+    (DeviceFeatureMessages, AuthFeatureMessage(BmdHidHandshakeStep.RESULT, 600)),
+    (DeviceFeatureMessages, SerialFeatureMessage("0123456789ABCDEF")),
+]
+
+
+def _register(types, message):
+    handler = MessageHandler(types)
+    data = handler.serialize(message)
+    name = type(message).__name__
+
+    @benchmark("parse.{0}".format(name))
+    def parse():
+        return lambda: handler.parse(data)
+
+    @benchmark("serialize.{0}".format(name))
+    def serialize():
+        return lambda: handler.serialize(message)
+
+
+for types, message in SAMPLES:
+    _register(types, message)
+
+
+# Random high bits for every one of the eight rotation cases
+CHALLENGES = [random.Random(0).getrandbits(61) << 3 | n for n in range(8)]
+
+
+def _verify(solve):
+    challenges = [random.Random(n).getrandbits(61) << 3 | n for n in range(8) for _ in range(256)]
+    expected = [crypto.solve_challenge_reference(challenge) for challenge in challenges]
+    if [int(response) for response in solve(challenges)] != expected:
+        raise Exception("{0} differs from the reference implementation".format(solve.__name__))
+
+
+@benchmark("crypto.solve_challenge_reference")
+def solve_challenge_reference():
+    solve = crypto.solve_challenge_reference
+
+    def run():
+        for challenge in CHALLENGES:
+            solve(challenge)
+
+    return run
+
+
+@benchmark("crypto.solve_challenge")
+def solve_challenge():
+    solve = crypto.solve_challenge
+    _verify(lambda challenges: [solve(challenge) for challenge in challenges])
+
+    def run():
+        for challenge in CHALLENGES:
+            solve(challenge)
+
+    return run
+
+
+@benchmark("crypto.solve_challenges.8192")
+def solve_challenges():
+    import numpy as np
+
+    _verify(crypto.solve_challenges)
+    challenges = np.array(CHALLENGES * 1024, dtype=np.uint64)
+    return lambda: crypto.solve_challenges(challenges)
@@ -0,0 +1,55 @@
+import struct
+
+from bmd_hid_device.protocol.events import OnJogEvent, OnKeyEvent, OnBatteryEvent
+from bmd_hid_device.protocol.types import BmdHidJogMode, BmdHidKey
+from .harness import benchmark
+
+
+# The decoders as they were before the layouts were precompiled, kept to
+# compare the read path against
+def _legacy_jog(message: bytes):
+    mode, value = struct.unpack_from('<xBix', message)
+    return OnJogEvent(BmdHidJogMode(mode), value)
+
+
+def _legacy_key(message: bytes):
+    keys = struct.unpack_from('<x6H', message)
+    return OnKeyEvent([BmdHidKey(key) for key in keys if key != 0])
+
+
+def _legacy_battery(message: bytes):
+    charging, level = struct.unpack_from('<x2B', message)
+    return OnBatteryEvent(charging, level)
+
+
+REPORTS = [
+    (OnJogEvent, _legacy_jog, OnJogEvent(BmdHidJogMode.RELATIVE, -3).serialize()),
+    (OnKeyEvent, _legacy_key, OnKeyEvent([BmdHidKey.LIVE_OWR, BmdHidKey.CAM2, BmdHidKey.CAM3]).serialize()),
+    (OnBatteryEvent, _legacy_battery, OnBatteryEvent(True, 87).serialize()),
+]
+
+
+def _register(event, legacy, report):
+    name = event.__name__
+
+    @benchmark("decode.legacy.{0}".format(name))
+    def decode_legacy():
+        return lambda: legacy(report)
+
+    @benchmark("decode.read.{0}".format(name))
+    def decode_read():
+        return lambda: event.read(report)
+
+    @benchmark("decode.unpack.{0}".format(name))
+    def decode_unpack():
+        return lambda: event.unpack(report)
+
+
+for event, legacy, report in REPORTS:
+    _register(event, legacy, report)
+
+
+@benchmark("decode.mask.OnKeyEvent")
+def decode_mask():
+    report = REPORTS[1][2]
+    return lambda: OnKeyEvent.mask(report)
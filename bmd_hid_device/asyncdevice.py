@@ -0,0 +1,130 @@
+import asyncio
+import time
+from typing import Optional, AsyncIterator
+
+from .hiddevice import BmdHidDevice
+from .protocol.events import OnInputEvent
+from .protocol.requests import SetConfigRequest
+from .protocol.types import BmdHidJogMode, BmdHidKey
+from .rawdevice import BmdRawDevice
+from .util.deviceinfo import HidDeviceInfo
+from .util.transport import HidTransport
+from .util.timeout import Timeout
+
+
+# hidapi exposes no file descriptor the event loop could wait on, so input
+# reports are read without blocking and the loop sleeps for poll_interval
+# whenever the device has nothing pending. Everything, including the periodic
+# re-authentication, runs on the event loop thread. Only the initial handshake
+# blocks, so open() does it on an executor thread. A failed re-authentication
+# is raised from events() or close().
+class AsyncBmdHidDevice(BmdHidDevice):
+    poll_interval: float
+    _refresh_task: Optional[asyncio.Task]
+
+    def __init__(self,
+                 device_info: HidDeviceInfo,
+                 poll_interval: float = 0.001,
+                 device: Optional[BmdRawDevice] = None):
+        super().__init__(device_info, device)
+        self.poll_interval = poll_interval
+        self._refresh_task = None
+
+    @classmethod
+    async def open(cls,
+                   device_info: HidDeviceInfo,
+                   poll_interval: float = 0.001,
+                   transport: Optional[HidTransport] = None):
+        device = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: BmdRawDevice(device_info, auto_refresh=False, transport=transport))
+        return cls(device_info, poll_interval, device)
+
+    def _open(self, device_info: HidDeviceInfo) -> BmdRawDevice:
+        return BmdRawDevice(device_info, auto_refresh=False)
+
+    def __str__(self):
+        return "AsyncBmdHidDevice({0}, timeout {1} sec)".format(self._device, self._device.timeout)
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if not self.isclosed():
+            self.leds.clear()
+            self.leds.flush(force=True)
+        self.close()
+
+    def start(self):
+        self._check_refresh()
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_forever())
+
+    def close(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        super().close()
+        self._check_refresh()
+
+    # Raises the error the re-authentication failed with, once
+    def _check_refresh(self):
+        task = self._refresh_task
+        if task is None or not task.done():
+            return
+        self._refresh_task = None
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+    def on_jog_event(self, mode: BmdHidJogMode, value: int):
+        pass
+
+    def on_key_down(self, key: BmdHidKey):
+        pass
+
+    def on_key_up(self, key: BmdHidKey):
+        pass
+
+    def on_battery(self, charging: bool, level: int):
+        pass
+
+    async def send(self, message: SetConfigRequest):
+        self._device.send(message)
+
+    async def authenticate(self) -> int:
+        authenticator = self._device.authenticator
+        deadline = Timeout(authenticator.timeout)
+        authenticator.challenge()
+        result = None
+        while result is None and deadline.remaining():
+            result = authenticator.handle(self._device.poll_feature())
+            if result is None:
+                await asyncio.sleep(self.poll_interval)
+        self._device.timeout = authenticator.finish(result)
+        return self._device.timeout
+
+    async def _refresh_forever(self):
+        while not self.isclosed():
+            await asyncio.sleep(self._device.timeout / 2)
+            await self.authenticate()
+
+    async def events(self) -> AsyncIterator[OnInputEvent]:
+        self.start()
+        while not self.isclosed():
+            message = self._device.poll(0)
+            if message is None:
+                self._check_refresh()
+                self._service_timers()
+                await asyncio.sleep(self.poll_interval)
+            else:
+                yield message
+        self._check_refresh()
+
+    async def run(self):
+        async for message in self.events():
+            if self.stats is None:
+                self.dispatch(message)
+            else:
+                read = time.monotonic_ns()
+                self.dispatch(message)
+                self.stats.dispatched(message.id(), read, time.monotonic_ns())
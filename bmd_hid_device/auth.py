@@ -1,4 +1,5 @@
 import threading
+import time
 from typing import Optional, Callable
 
 import hid
@@ -8,12 +9,16 @@ from .protocol.features import DeviceFeatureMessage, AuthFeatureMessage
 from .protocol.types import BmdHidHandshakeStep
 from .util.timeout import Timeout
 
+POLL_DELAY_MIN = 0.0005
+POLL_DELAY_MAX = 0.008
+
 
 class Authenticator:
     _timeout: int
     _poll: Callable[[], DeviceFeatureMessage]
     _send: Callable[[DeviceFeatureMessage], None]
-    _scheduler: Optional[threading.Timer]
+    _scheduler: Optional[threading.Thread]
+    _stopped: threading.Event
     _on_close: Optional[Callable[[], None]]
 
     _our_challenge: int
@@ -28,6 +33,7 @@ class Authenticator:
         self._poll = poll
         self._send = send
         self._scheduler = None
+        self._stopped = threading.Event()
         self._on_close = on_close
 
         self._our_challenge = 0x0000000000000000
@@ -48,26 +54,62 @@ class Authenticator:
             return message.data
         return None
 
-    def authenticate(self):
-        deadline = Timeout(self._timeout)
+    @property
+    def timeout(self) -> int:
+        return self._timeout
+
+    def challenge(self):
         self._send(AuthFeatureMessage(BmdHidHandshakeStep.PC_CHALLENGE, 0))
-        result = None
-        while result is None and deadline.remaining():
-            result = self.handle(self._poll())
+
+    def finish(self, result: Optional[int]) -> int:
         if result is None or result == 0:
             self.stop()
-            self._on_close()
+            if self._on_close is not None:
+                self._on_close()
             raise hid.HIDException("Could not authenticate with device")
         return result
 
-    def start(self):
+    # The device takes a moment to answer each step. Instead of spinning on the
+    # feature report, polls back off exponentially until the step changes.
+    def authenticate(self) -> int:
+        deadline = Timeout(self._timeout)
+        self.challenge()
+        result = None
+        step = None
+        delay = POLL_DELAY_MIN
+        while result is None and deadline.remaining():
+            message = self._poll()
+            result = self.handle(message)
+            if result is not None:
+                break
+            if isinstance(message, AuthFeatureMessage) and message.step != step:
+                step = message.step
+                delay = POLL_DELAY_MIN
+            else:
+                time.sleep(delay)
+                delay = min(delay * 2, POLL_DELAY_MAX)
+        return self.finish(result)
+
+    # Re-authenticates from one thread for as long as the device is in use,
+    # each time half of the last returned timeout has passed
+    def start(self) -> int:
         self.stop()
         interval = self.authenticate()
-        self._scheduler = threading.Timer(interval / 2, self.authenticate)
+        self._stopped = threading.Event()
+        self._scheduler = threading.Thread(target=self._refresh_forever, args=(interval, self._stopped), daemon=True)
         self._scheduler.start()
+        return interval
+
+    def _refresh_forever(self, interval: int, stopped: threading.Event):
+        while not stopped.wait(interval / 2):
+            try:
+                interval = self.authenticate()
+            except hid.HIDException:
+                return
 
     def stop(self):
         if self._scheduler is not None:
-            self._scheduler.cancel()
-            self._scheduler.join()
+            self._stopped.set()
+            if self._scheduler is not threading.current_thread():
+                self._scheduler.join()
             self._scheduler = None
@@ -0,0 +1,65 @@
+from array import array
+
+from .protocol.events import OnJogEvent, OnKeyEvent, OnBatteryEvent
+
+_JOG = OnJogEvent.id()
+_KEY = OnKeyEvent.id()
+_BATTERY = OnBatteryEvent.id()
+
+
+# Input reports decoded into preallocated parallel columns, meant to be reused
+# from one batch to the next. Row i is a report of type report_id[i], read at
+# timestamp[i] (monotonic ns); only the columns of that type are written for
+# it, the others keep whatever an earlier batch left there: jog_mode and
+# jog_value for jog reports, key_mask (see keymask) for key reports and
+# battery_charging and battery_level for battery reports.
+class EventBatch:
+    capacity: int
+    count: int
+
+    report_id: array
+    timestamp: array
+    jog_mode: array
+    jog_value: array
+    key_mask: array
+    battery_charging: array
+    battery_level: array
+
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self.count = 0
+        self.report_id = array('B', bytes(capacity))
+        self.timestamp = array('q', bytes(8 * capacity))
+        self.jog_mode = array('B', bytes(capacity))
+        self.jog_value = array('i', bytes(4 * capacity))
+        self.key_mask = array('Q', bytes(8 * capacity))
+        self.battery_charging = array('B', bytes(capacity))
+        self.battery_level = array('B', bytes(capacity))
+
+    def __len__(self):
+        return self.count
+
+    def full(self) -> bool:
+        return self.count == self.capacity
+
+    def clear(self):
+        self.count = 0
+
+    # Unknown reports are skipped, False if there was no room for the report
+    def append(self, data: bytes, timestamp: int) -> bool:
+        i = self.count
+        if i == self.capacity:
+            return False
+        report_id = data[0]
+        if report_id == _JOG:
+            self.jog_mode[i], self.jog_value[i] = OnJogEvent.unpack(data)
+        elif report_id == _KEY:
+            self.key_mask[i] = OnKeyEvent.mask(data)
+        elif report_id == _BATTERY:
+            self.battery_charging[i], self.battery_level[i] = OnBatteryEvent.unpack(data)
+        else:
+            return True
+        self.report_id[i] = report_id
+        self.timestamp[i] = timestamp
+        self.count = i + 1
+        return True
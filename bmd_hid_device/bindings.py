@@ -0,0 +1,181 @@
+import itertools
+from typing import Callable, NamedTuple, Optional
+
+from .cutmode import CutMode
+from .hiddevice import BmdHidDevice
+from .jogmode import JogMode
+from .protocol.keymask import KEY_CODES, key_mask
+from .protocol.types import BmdHidKey, BmdHidLed, BmdHidJogLed
+from .subscriptions import Subscription
+
+
+# Runs action when key is pressed while exactly the modifiers are held (of
+# all keys used as modifiers in the set) and, if given, in the cut and jog
+# mode. led is lit while the key is held.
+class Binding(NamedTuple):
+    key: BmdHidKey
+    action: object
+    modifiers: tuple[BmdHidKey, ...] = ()
+    cut_mode: Optional[CutMode] = None
+    jog_mode: Optional[JogMode] = None
+    led: Optional[BmdHidLed | BmdHidJogLed] = None
+
+
+# Bindings for one product ID, or for any device without one
+class BindingSet(NamedTuple):
+    bindings: tuple[Binding, ...]
+    product_id: Optional[int] = None
+
+
+_Table = list[Optional[Binding]]
+_EMPTY: _Table = [None] * KEY_CODES
+
+
+# A binding set compiled into one flat table per combination of cut mode, jog
+# mode and modifier chord, indexed by key code. Bindings with a mode win over
+# ones without.
+class CompiledBindings:
+    modifier_mask: int
+    tables: dict[tuple[Optional[CutMode], Optional[JogMode], int], _Table]
+
+    def __init__(self, bindings: tuple[Binding, ...]):
+        self.modifier_mask = key_mask(*(modifier for binding in bindings for modifier in binding.modifiers))
+        chords = {key_mask(*binding.modifiers) for binding in bindings}
+        by_specificity = sorted(bindings, key=lambda binding: (binding.cut_mode is not None) + (binding.jog_mode is not None))
+        self.tables = {}
+        for cut_mode, jog_mode, chord in itertools.product([None, *CutMode], [None, *JogMode], chords):
+            table = [None] * KEY_CODES
+            for binding in by_specificity:
+                if key_mask(*binding.modifiers) != chord:
+                    continue
+                if binding.cut_mode is not None and binding.cut_mode != cut_mode:
+                    continue
+                if binding.jog_mode is not None and binding.jog_mode != jog_mode:
+                    continue
+                table[binding.key] = binding
+            self.tables[(cut_mode, jog_mode, chord)] = table
+
+    def table(self, cut_mode: Optional[CutMode], jog_mode: Optional[JogMode], modifiers: int) -> _Table:
+        return self.tables.get((cut_mode, jog_mode, modifiers & self.modifier_mask), _EMPTY)
+
+
+# Dispatches key presses to bound actions. The table for the current modes
+# and held modifiers is only looked up again when one of them changes, so a
+# key press costs one list index however many bindings are loaded. load()
+# compiles a new binding set before swapping it in with a single assignment,
+# so bindings can be reloaded from another thread while the device runs: the
+# selected table remembers which compiled set it came from, and is selected
+# again on the next key press if that set was replaced in the meantime.
+# Actions are passed to on_action, or called without arguments.
+class BindingEngine:
+    product_id: Optional[int]
+    on_action: Optional[Callable[[object, BmdHidKey], None]]
+    cut_mode: Optional[CutMode]
+    jog_mode: Optional[JogMode]
+
+    _binding_sets: tuple[BindingSet, ...]
+    _compiled: CompiledBindings
+    _selection: tuple[CompiledBindings, _Table]
+    _held: int
+    _pressed: _Table
+    _device: Optional[BmdHidDevice]
+    _subscriptions: list[Subscription]
+
+    def __init__(self,
+                 on_action: Optional[Callable[[object, BmdHidKey], None]] = None,
+                 product_id: Optional[int] = None):
+        self.product_id = product_id
+        self.on_action = on_action
+        self.cut_mode = None
+        self.jog_mode = None
+        self._binding_sets = ()
+        self._compiled = CompiledBindings(())
+        self._selection = (self._compiled, _EMPTY)
+        self._held = 0
+        self._pressed = [None] * KEY_CODES
+        self._device = None
+        self._subscriptions = []
+
+    # The set for the product ID of the device wins over one for any device
+    def load(self, *binding_sets: BindingSet):
+        bindings = ()
+        for binding_set in binding_sets:
+            if binding_set.product_id == self.product_id:
+                bindings = binding_set.bindings
+                break
+            if binding_set.product_id is None and not bindings:
+                bindings = binding_set.bindings
+        self._binding_sets = binding_sets
+        compiled = CompiledBindings(tuple(bindings))
+        self._compiled = compiled
+        self._select(compiled)
+
+    def attach(self, device: BmdHidDevice):
+        self.detach()
+        self._device = device
+        self.product_id = device.device_info()["product_id"]
+        self._held = device.held_mask
+        self._subscriptions = [
+            device.subscriptions.on_key_down(self.key_down),
+            device.subscriptions.on_key_up(self.key_up),
+        ]
+        self.load(*self._binding_sets)
+
+    def detach(self):
+        if self._device is not None:
+            for subscription in self._subscriptions:
+                self._device.subscriptions.unsubscribe(subscription)
+        self._device = None
+        self._subscriptions = []
+
+    def set_cut_mode(self, cut_mode: Optional[CutMode]):
+        self.cut_mode = cut_mode
+        self._select(self._compiled)
+
+    def set_jog_mode(self, jog_mode: Optional[JogMode]):
+        self.jog_mode = jog_mode
+        self._select(self._compiled)
+
+    def _select(self, compiled: CompiledBindings) -> _Table:
+        table = compiled.table(self.cut_mode, self.jog_mode, self._held)
+        self._selection = (compiled, table)
+        return table
+
+    def _table(self, compiled: CompiledBindings) -> _Table:
+        selected, table = self._selection
+        if selected is not compiled:
+            table = self._select(compiled)
+        return table
+
+    def lookup(self, key: BmdHidKey) -> Optional[Binding]:
+        return self._table(self._compiled)[key]
+
+    def key_down(self, key: BmdHidKey):
+        compiled = self._compiled
+        binding = self._table(compiled)[key]
+        bit = 1 << key
+        self._held |= bit
+        if bit & compiled.modifier_mask:
+            self._select(compiled)
+        if binding is None:
+            return
+        self._pressed[key] = binding
+        if binding.led is not None and self._device is not None:
+            self._device.leds.on(binding.led)
+        if self.on_action is not None:
+            self.on_action(binding.action, key)
+        else:
+            binding.action()
+
+    def key_up(self, key: BmdHidKey):
+        compiled = self._compiled
+        bit = 1 << key
+        self._held &= ~bit
+        if bit & compiled.modifier_mask:
+            self._select(compiled)
+        binding = self._pressed[key]
+        if binding is None:
+            return
+        self._pressed[key] = None
+        if binding.led is not None and self._device is not None:
+            self._device.leds.off(binding.led)
@@ -0,0 +1,407 @@
+import collections
+import enum
+import json
+import os
+import selectors
+import socket
+import stat
+import struct
+import sys
+import time
+from typing import Optional
+
+import hid
+
+from .hub import DeviceHub
+from .protocol.events import OnInputEvent, OnInputEvents
+from .protocol.requests import SetConfigRequest, SetConfigRequests
+from .rawdevice import BmdRawDevice
+from .util.capture import SessionRecorder, RecordKind
+from .util.deviceinfo import HidDeviceInfo
+from .util.messagehandler import MessageHandler
+from .util.stats import DeviceStats
+
+# Every frame is the frame kind, the device slot and the LE16 payload length,
+# followed by the payload. Input and output frames carry the report exactly
+# as sent over HID, device frames the device info and timeout as JSON.
+_FRAME_HEADER = struct.Struct('<BBH')
+
+
+class FrameKind(enum.IntEnum):
+    DEVICE = 0x00
+    REMOVED = 0x01
+    INPUT = 0x02
+    OUTPUT = 0x03
+
+
+def frame(kind: FrameKind, slot: int, payload: bytes) -> bytes:
+    return _FRAME_HEADER.pack(kind, slot, len(payload)) + payload
+
+
+# Splits complete frames off the front of buffer
+def read_frames(buffer: bytearray) -> list[tuple[FrameKind, int, bytes]]:
+    frames = []
+    offset = 0
+    while len(buffer) - offset >= _FRAME_HEADER.size:
+        kind, slot, length = _FRAME_HEADER.unpack_from(buffer, offset)
+        end = offset + _FRAME_HEADER.size + length
+        if len(buffer) < end:
+            break
+        frames.append((kind, slot, bytes(buffer[offset + _FRAME_HEADER.size:end])))
+        offset = end
+    del buffer[:offset]
+    return frames
+
+
+def _device_payload(device: BmdRawDevice) -> bytes:
+    device_info = {key: value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
+                   for key, value in device.device_info.items()}
+    return json.dumps({"device_info": device_info, "timeout": device.timeout}).encode('utf-8')
+
+
+class _BridgeClient:
+    sock: socket.socket
+    incoming: bytearray
+    outgoing: bytearray
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.incoming = bytearray()
+        self.outgoing = bytearray()
+
+
+# Owns the devices of a DeviceHub and shares them with any number of local
+# processes over a UNIX socket. Input reports are forwarded to every client
+# as they are, frames for a client are collected over one pass of the loop
+# and written with a single send. A client whose unsent frames exceed
+# max_buffer bytes has stopped reading and is disconnected, so it can't hold
+# up the others. Clients send SetConfigRequests back as output frames.
+class DeviceBridge:
+    path: str
+    hub: DeviceHub
+    max_buffer: int
+
+    _server: socket.socket
+    # Device and inode of the socket file bound by this bridge
+    _bound: Optional[tuple[int, int]]
+    _selector: selectors.BaseSelector
+    _clients: dict[int, _BridgeClient]
+    _slots: dict[str, int]
+    _next_slot: int
+    _requests: MessageHandler[SetConfigRequest]
+
+    def __init__(self, path: str, hub: Optional[DeviceHub] = None, max_buffer: int = 65536):
+        self.path = path
+        self.hub = hub if hub is not None else DeviceHub()
+        self.max_buffer = max_buffer
+        self._clients = {}
+        self._slots = {}
+        self._next_slot = 0
+        self._requests = MessageHandler(SetConfigRequests)
+        self._bound = None
+        # A socket left behind by a bridge that is gone is replaced, anything
+        # else at path is left alone
+        try:
+            mode = os.lstat(path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise Exception("{0} exists and is not a socket".format(path))
+            os.unlink(path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(path)
+        bound = os.lstat(path)
+        self._bound = (bound.st_dev, bound.st_ino)
+        self._server.listen()
+        self._server.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._server, selectors.EVENT_READ)
+        for serial in self.hub.serials():
+            self._announce(serial)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def open(self, device_info: HidDeviceInfo) -> BmdRawDevice:
+        device = self.hub.open(device_info)
+        self._announce(device.device_info["serial_number"])
+        return device
+
+    def add(self, device: BmdRawDevice):
+        self.hub.add(device)
+        self._announce(device.device_info["serial_number"])
+
+    def close(self):
+        for client in list(self._clients.values()):
+            self._disconnect(client)
+        self._selector.close()
+        self._server.close()
+        if self._bound is not None:
+            try:
+                current = os.lstat(self.path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and (current.st_dev, current.st_ino) == self._bound:
+                os.unlink(self.path)
+            self._bound = None
+        self.hub.close()
+
+    def _device_frames(self) -> bytes:
+        return b''.join(frame(FrameKind.DEVICE, slot, _device_payload(self.hub.device(serial)))
+                        for serial, slot in self._slots.items())
+
+    def _announce(self, serial: str):
+        if serial in self._slots:
+            return
+        if len(self._slots) == 256:
+            raise Exception("Too many devices")
+        while self._next_slot in self._slots.values():
+            self._next_slot = (self._next_slot + 1) % 256
+        self._slots[serial] = self._next_slot
+        self._broadcast(frame(FrameKind.DEVICE, self._next_slot, _device_payload(self.hub.device(serial))))
+
+    def _check_removed(self):
+        if len(self._slots) == len(self.hub):
+            return
+        for serial in [serial for serial in self._slots if serial not in self.hub.serials()]:
+            self._broadcast(frame(FrameKind.REMOVED, self._slots.pop(serial), b''))
+
+    def _broadcast(self, data: bytes):
+        for client in self._clients.values():
+            client.outgoing += data
+
+    def _accept(self):
+        try:
+            sock, _ = self._server.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        client = _BridgeClient(sock)
+        client.outgoing += self._device_frames()
+        self._clients[sock.fileno()] = client
+        self._selector.register(sock, selectors.EVENT_READ, client)
+
+    def _disconnect(self, client: _BridgeClient):
+        self._clients.pop(client.sock.fileno(), None)
+        self._selector.unregister(client.sock)
+        client.sock.close()
+
+    def _receive(self, client: _BridgeClient):
+        try:
+            data = client.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._disconnect(client)
+            return
+        client.incoming += data
+        serials = {slot: serial for serial, slot in self._slots.items()}
+        for kind, slot, payload in read_frames(client.incoming):
+            serial = serials.get(slot)
+            if kind != FrameKind.OUTPUT or serial is None:
+                continue
+            message = self._requests.parse(payload)
+            if message is not None:
+                self.hub.send(serial, message)
+
+    def _flush(self):
+        for client in list(self._clients.values()):
+            if not client.outgoing:
+                continue
+            try:
+                sent = client.sock.send(client.outgoing)
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError:
+                self._disconnect(client)
+                continue
+            del client.outgoing[:sent]
+            if len(client.outgoing) > self.max_buffer:
+                print("Disconnecting slow client, {0} bytes pending".format(len(client.outgoing)), file=sys.stderr)
+                self._disconnect(client)
+
+    def serve(self, timeout: Optional[int] = None):
+        for report in self.hub.poll_reports(timeout):
+            slot = self._slots.get(report.serial)
+            if slot is not None:
+                self._broadcast(frame(FrameKind.INPUT, slot, report.data))
+        self._check_removed()
+        # Without devices there is nothing to read from, so wait for clients
+        wait = 0
+        if not len(self.hub):
+            wait = None if timeout is None else timeout / 1000
+        for key, _ in self._selector.select(wait):
+            if key.data is None:
+                self._accept()
+            else:
+                self._receive(key.data)
+        self._flush()
+
+    def serve_forever(self, timeout: int = 1):
+        while True:
+            try:
+                self.serve(timeout)
+            except KeyboardInterrupt:
+                print("Thread interrupted via keyboard")
+                break
+
+
+# Client side of DeviceBridge for one of its devices, the first one or the
+# one with the given serial. Offers the same interface as BmdRawDevice, so it
+# can be passed to BmdHidDevice; authentication stays with the bridge.
+class BridgeRawDevice:
+    path: str
+    device_info: Optional[HidDeviceInfo]
+    timeout: int
+    recorder: Optional[SessionRecorder]
+
+    on_input_event_handler: MessageHandler[OnInputEvent]
+    set_config_request_handler: MessageHandler[SetConfigRequest]
+
+    _stats: Optional[DeviceStats]
+    _sock: Optional[socket.socket]
+    _serial: Optional[str]
+    _slot: Optional[int]
+    _incoming: bytearray
+    _reports: collections.deque[bytes]
+
+    def __init__(self, path: str, serial: Optional[str] = None, timeout: Optional[int] = 1000):
+        self.path = path
+        self.device_info = None
+        self.timeout = 0
+        self.recorder = None
+        self.on_input_event_handler = MessageHandler(OnInputEvents)
+        self.set_config_request_handler = MessageHandler(SetConfigRequests)
+        self.stats = None
+        self._serial = serial
+        self._slot = None
+        self._incoming = bytearray()
+        self._reports = collections.deque()
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self._sock.connect(path)
+        except OSError as e:
+            self._sock.close()
+            self._sock = None
+            raise hid.HIDException("Could not connect to {0}: {1}".format(path, e))
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        while self._slot is None:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0 or not self._receive(remaining):
+                self.close()
+                raise hid.HIDException("No device {0} on {1}".format(serial if serial is not None else "", path))
+
+    def __str__(self):
+        if self.device_info is None:
+            return "bridge {0}".format(self.path)
+        return "{0} {1}, {2} (bridge {3})".format(
+            self.device_info["manufacturer_string"],
+            self.device_info["product_string"],
+            self.device_info["serial_number"],
+            self.path
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def stats(self) -> Optional[DeviceStats]:
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats: Optional[DeviceStats]):
+        self._stats = stats
+        self.on_input_event_handler.stats = stats
+
+    def isclosed(self):
+        return self._sock is None
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _handle(self, kind: FrameKind, slot: int, payload: bytes):
+        if kind == FrameKind.DEVICE and self._slot is None:
+            info = json.loads(payload)
+            if self._serial is None or info["device_info"]["serial_number"] == self._serial:
+                self._slot = slot
+                self.device_info = info["device_info"]
+                self.timeout = info["timeout"]
+        elif slot != self._slot:
+            return
+        elif kind == FrameKind.INPUT:
+            self._reports.append(payload)
+        elif kind == FrameKind.REMOVED:
+            self.close()
+
+    # Waits up to timeout seconds for data, False once the bridge went away
+    def _receive(self, timeout: Optional[float]) -> bool:
+        self._sock.settimeout(timeout)
+        try:
+            data = self._sock.recv(65536)
+        except (socket.timeout, BlockingIOError):
+            return True
+        except OSError:
+            data = b''
+        if not data:
+            self.close()
+            return False
+        self._incoming += data
+        for kind, slot, payload in read_frames(self._incoming):
+            self._handle(kind, slot, payload)
+            if self._sock is None:
+                return False
+        return True
+
+    def read_report(self, timeout: Optional[int] = None) -> Optional[bytes]:
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        while not self._reports:
+            if self._sock is None:
+                raise hid.HIDException("device is closed")
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self._receive(remaining) and not self._reports:
+                raise hid.HIDException("device is closed")
+            if not self._reports and remaining is not None and time.monotonic() >= deadline:
+                if self._stats is not None:
+                    self._stats.empty_reads += 1
+                return None
+        data = self._reports.popleft()
+        if self._stats is not None:
+            self._stats.reads += 1
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.INPUT, data)
+        return data
+
+    def poll(self, timeout: Optional[int] = None) -> Optional[OnInputEvent]:
+        data = self.read_report(timeout)
+        if data is None:
+            return None
+        return self.on_input_event_handler.parse(data)
+
+    def send(self, message: SetConfigRequest):
+        if self._sock is None:
+            raise hid.HIDException("device is closed")
+        data = self.set_config_request_handler.serialize(message)
+        self._sock.settimeout(None)
+        try:
+            self._sock.sendall(frame(FrameKind.OUTPUT, self._slot, data))
+        except OSError as e:
+            self.close()
+            raise hid.HIDException(str(e))
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.OUTPUT, data)
+        if self._stats is not None:
+            self._stats.writes += 1
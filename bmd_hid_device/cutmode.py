@@ -10,14 +10,10 @@ class CutMode(enum.IntEnum):
 
     @staticmethod
     def from_key(key: BmdHidKey):
-        if key == BmdHidKey.CUT:
-            return CutMode.CUT
-        elif key == BmdHidKey.DIS:
-            return CutMode.DIS
-        elif key == BmdHidKey.SMTH_CUT:
-            return CutMode.SMTH_CUT
-        else:
+        mode = _MODES.get(key)
+        if mode is None:
             raise Exception("Unknown cut mode: {0}".format(key.name))
+        return mode
 
     @staticmethod
     def leds() -> BmdHidLed:
@@ -28,21 +24,20 @@ class CutMode(enum.IntEnum):
         return [BmdHidKey.CUT, BmdHidKey.DIS, BmdHidKey.SMTH_CUT]
 
     def led(self) -> BmdHidLed:
-        if self == CutMode.CUT:
-            return BmdHidLed.CUT
-        elif self == CutMode.DIS:
-            return BmdHidLed.DIS
-        elif self == CutMode.SMTH_CUT:
-            return BmdHidLed.SMTH_CUT
-        else:
-            raise Exception("Unknown cut mode: {0}".format(self.name))
+        return _LEDS[self]
 
     def key(self) -> BmdHidKey:
-        if self == CutMode.CUT:
-            return BmdHidKey.CUT
-        elif self == CutMode.DIS:
-            return BmdHidKey.DIS
-        elif self == CutMode.SMTH_CUT:
-            return BmdHidKey.SMTH_CUT
-        else:
-            raise Exception("Unknown cut mode: {0}".format(self.name))
+        return _KEYS[self]
+
+
+_KEYS = {
+    CutMode.CUT: BmdHidKey.CUT,
+    CutMode.DIS: BmdHidKey.DIS,
+    CutMode.SMTH_CUT: BmdHidKey.SMTH_CUT,
+}
+_LEDS = {
+    CutMode.CUT: BmdHidLed.CUT,
+    CutMode.DIS: BmdHidLed.DIS,
+    CutMode.SMTH_CUT: BmdHidLed.SMTH_CUT,
+}
+_MODES = {key: mode for mode, key in _KEYS.items()}
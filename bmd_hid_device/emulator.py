@@ -0,0 +1,248 @@
+import heapq
+import random
+import threading
+import time
+from typing import Optional, Iterable
+
+import hid
+
+from .devices import VID_BMD, PID_SPEED_EDITOR
+from .protocol import crypto
+from .protocol.events import OnInputEvent, OnJogEvent, OnKeyEvent, OnBatteryEvent
+from .protocol.features import AuthFeatureMessage, SerialFeatureMessage, DeviceFeatureMessages
+from .protocol.requests import SetLedRequest, SetJogModeRequest, SetJogLedRequest, SetConfigRequests
+from .protocol.types import BmdHidHandshakeStep, BmdHidJogMode, BmdHidKey, BmdHidLed, BmdHidJogLed
+from .util.deviceinfo import HidDeviceInfo
+from .util.messagehandler import MessageHandler
+
+EMULATED_KEYS = [key for key in BmdHidKey if key != BmdHidKey.NONE]
+
+
+class _Generator:
+    period: int
+    due: int
+    remaining: Optional[int]
+    kinds: tuple[type, ...]
+
+    def __init__(self, rate: float, count: Optional[int], kinds: tuple[type, ...], start: int):
+        self.period = max(int(1_000_000_000 / rate), 1)
+        self.due = start
+        self.remaining = count
+        self.kinds = kinds
+
+
+# Device side of a Speed Editor, usable as transport for BmdRawDevice. It
+# answers the authentication handshake, keeps the state set by output reports
+# and hands out input reports that were pushed, scripted with a delay or
+# generated randomly at a fixed rate. Like the hardware, it only sends input
+# reports while authenticated.
+class SpeedEditorEmulator:
+    serial: str
+    timeout: int
+    product_id: int
+
+    leds: BmdHidLed
+    jog_leds: BmdHidJogLed
+    jog_mode: BmdHidJogMode
+    writes: int
+    reads: int
+
+    _lock: threading.Condition
+    _closed: bool
+    _random: random.Random
+    _scripted: list[tuple[int, int, bytes]]
+    _sequence: int
+    _generators: list[_Generator]
+    _feature: Optional[bytes]
+    _challenge: int
+    _auth_deadline: int
+    _held: list[BmdHidKey]
+    _position: int
+
+    def __init__(self,
+                 serial: str = "EMULATED",
+                 timeout: int = 600,
+                 seed: Optional[int] = None,
+                 product_id: int = PID_SPEED_EDITOR):
+        self.serial = serial
+        self.timeout = timeout
+        self.product_id = product_id
+
+        self.leds = BmdHidLed(0)
+        self.jog_leds = BmdHidJogLed(0)
+        self.jog_mode = BmdHidJogMode.RELATIVE
+        self.writes = 0
+        self.reads = 0
+
+        self._lock = threading.Condition()
+        self._closed = False
+        self._random = random.Random(seed)
+        self._scripted = []
+        self._sequence = 0
+        self._generators = []
+        self._feature = None
+        self._challenge = 0
+        self._auth_deadline = 0
+        self._held = []
+        self._position = 0
+
+        self._config_handler = MessageHandler(SetConfigRequests)
+        self._feature_handler = MessageHandler(DeviceFeatureMessages)
+
+    def __str__(self):
+        return "SpeedEditorEmulator({0})".format(self.serial)
+
+    def device_info(self) -> HidDeviceInfo:
+        return HidDeviceInfo(
+            path="emulator://{0}".format(self.serial),
+            vendor_id=VID_BMD,
+            product_id=self.product_id,
+            serial_number=self.serial,
+            release_number=0,
+            manufacturer_string="Blackmagic Design",
+            product_string="Emulated Speed Editor",
+            usage_page=0,
+            usage=0,
+            interface_number=0,
+        )
+
+    def authenticated(self) -> bool:
+        return self._auth_deadline > time.monotonic_ns()
+
+    def push(self, event: OnInputEvent):
+        self.script([(0, event)])
+
+    def script(self, events: Iterable[tuple[float, OnInputEvent]], start: Optional[int] = None):
+        if start is None:
+            start = time.monotonic_ns()
+        with self._lock:
+            for delay, event in events:
+                heapq.heappush(self._scripted, (start + int(delay * 1_000_000_000), self._sequence, event.serialize()))
+                self._sequence += 1
+            self._lock.notify_all()
+
+    def generate(self,
+                 rate: float,
+                 count: Optional[int] = None,
+                 kinds: tuple[type, ...] = (OnJogEvent, OnKeyEvent, OnBatteryEvent),
+                 start: Optional[int] = None):
+        if start is None:
+            start = time.monotonic_ns()
+        with self._lock:
+            self._generators.append(_Generator(rate, count, kinds, start))
+            self._lock.notify_all()
+
+    def stop_generators(self):
+        with self._lock:
+            self._generators.clear()
+
+    def _random_event(self, kind: type) -> OnInputEvent:
+        if kind is OnJogEvent:
+            if self.jog_mode in (BmdHidJogMode.ABSOLUTE, BmdHidJogMode.ABSOLUTE_DEADZONE):
+                self._position = max(-4096, min(4096, self._position + self._random.randint(-64, 64)))
+                return OnJogEvent(self.jog_mode, self._position)
+            return OnJogEvent(self.jog_mode, self._random.choice((-3, -2, -1, 1, 2, 3)))
+        if kind is OnKeyEvent:
+            if self._held and (len(self._held) == 6 or self._random.random() < 0.5):
+                self._held.remove(self._random.choice(self._held))
+            else:
+                self._held.append(self._random.choice([key for key in EMULATED_KEYS if key not in self._held]))
+            return OnKeyEvent(list(self._held))
+        if kind is OnBatteryEvent:
+            return OnBatteryEvent(self._random.random() < 0.5, self._random.randint(0, 100))
+        raise Exception("Unknown event type {0}".format(kind))
+
+    def _next_due(self) -> Optional[int]:
+        due = [generator.due for generator in self._generators]
+        if self._scripted:
+            due.append(self._scripted[0][0])
+        return min(due) if due else None
+
+    def _take(self, now: int) -> Optional[bytes]:
+        if self._scripted and self._scripted[0][0] <= now:
+            return heapq.heappop(self._scripted)[2]
+        for generator in self._generators:
+            if generator.due <= now:
+                generator.due += generator.period
+                if generator.remaining is not None:
+                    generator.remaining -= 1
+                    if generator.remaining <= 0:
+                        self._generators.remove(generator)
+                return self._random_event(self._random.choice(generator.kinds)).serialize()
+        return None
+
+    def _check_open(self):
+        if self._closed:
+            raise hid.HIDException("device is closed")
+
+    def read(self, size: int, timeout: Optional[int] = None) -> bytes:
+        deadline = None if timeout is None else time.monotonic_ns() + timeout * 1_000_000
+        with self._lock:
+            while True:
+                self._check_open()
+                now = time.monotonic_ns()
+                if self.authenticated():
+                    report = self._take(now)
+                    if report is not None:
+                        self.reads += 1
+                        return report[:size]
+                    wake = self._next_due()
+                else:
+                    wake = None
+                if deadline is not None:
+                    if deadline <= now:
+                        return b''
+                    wake = deadline if wake is None else min(wake, deadline)
+                self._lock.wait(None if wake is None else max(wake - now, 0) / 1_000_000_000)
+
+    def write(self, data: bytes) -> int:
+        with self._lock:
+            self._check_open()
+            message = self._config_handler.parse(bytes(data))
+            if isinstance(message, SetLedRequest):
+                self.leds = message.leds
+            elif isinstance(message, SetJogModeRequest):
+                self.jog_mode = message.mode
+                self._position = 0
+            elif isinstance(message, SetJogLedRequest):
+                self.jog_leds = message.leds
+            self.writes += 1
+            return len(data)
+
+    def get_feature_report(self, report_id: int, size: int) -> bytes:
+        with self._lock:
+            self._check_open()
+            if report_id == SerialFeatureMessage.id():
+                return SerialFeatureMessage(self.serial).serialize()[:size]
+            if report_id == AuthFeatureMessage.id() and self._feature is not None:
+                return self._feature[:size]
+            return b''
+
+    def send_feature_report(self, data: bytes) -> int:
+        with self._lock:
+            self._check_open()
+            message = self._feature_handler.parse(bytes(data))
+            if not isinstance(message, AuthFeatureMessage):
+                return len(data)
+            if message.step == BmdHidHandshakeStep.PC_CHALLENGE:
+                self._challenge = self._random.getrandbits(64)
+                reply = AuthFeatureMessage(BmdHidHandshakeStep.PC_CHALLENGE, self._challenge)
+            elif message.step == BmdHidHandshakeStep.DEVICE_CHALLENGE:
+                reply = AuthFeatureMessage(BmdHidHandshakeStep.DEVICE_RESPONSE, 0)
+            elif message.step == BmdHidHandshakeStep.PC_RESPONSE:
+                if message.data == crypto.solve_challenge(self._challenge):
+                    self._auth_deadline = time.monotonic_ns() + self.timeout * 1_000_000_000
+                    reply = AuthFeatureMessage(BmdHidHandshakeStep.RESULT, self.timeout)
+                else:
+                    self._auth_deadline = 0
+                    reply = AuthFeatureMessage(BmdHidHandshakeStep.RESULT, 0)
+                self._lock.notify_all()
+            else:
+                reply = None
+            self._feature = reply.serialize() if reply is not None else None
+            return len(data)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
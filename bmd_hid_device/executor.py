@@ -0,0 +1,206 @@
+import collections
+import enum
+import queue
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, NamedTuple, Optional
+
+from .jogcoalescer import ABSOLUTE_JOG_MODES
+from .util.stats import LatencyHistogram, HistogramSnapshot
+
+
+class OverflowPolicy(enum.Enum):
+    # The reading thread waits for room in the queue
+    BLOCK = 0
+    # The oldest queued event is dropped
+    DROP_OLDEST = 1
+    # A jog event is merged into the newest queued one of the same mode, other
+    # events wait for room like with BLOCK, so no key transition is lost
+    COALESCE_JOG = 2
+
+
+class QueueStats(NamedTuple):
+    depth: int
+    max_depth: int
+    dropped: int
+    coalesced: int
+    # Time from being queued to the handler starting, and handler run time
+    wait: HistogramSnapshot
+    run: HistogramSnapshot
+
+
+class _Call:
+    callback: Callable
+    args: tuple
+    jog: bool
+    queued: int
+
+    def __init__(self, callback: Callable, args: tuple, jog: bool):
+        self.callback = callback
+        self.args = args
+        self.jog = jog
+        self.queued = time.monotonic_ns()
+
+
+# The callbacks of one device, run by the workers of a CallbackExecutor in
+# the order they were submitted. At most one worker runs a queue at a time.
+class CallbackQueue:
+    size: int
+    policy: OverflowPolicy
+    max_depth: int
+    dropped: int
+    coalesced: int
+    closed: bool
+
+    _executor: 'CallbackExecutor'
+    _calls: collections.deque[_Call]
+    _lock: threading.Condition
+    _scheduled: bool
+    _wait: LatencyHistogram
+    _run: LatencyHistogram
+
+    def __init__(self, executor: 'CallbackExecutor', size: int, policy: OverflowPolicy):
+        self.size = size
+        self.policy = policy
+        self.max_depth = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._executor = executor
+        self._calls = collections.deque()
+        self._lock = threading.Condition()
+        self._scheduled = False
+        self._wait = LatencyHistogram()
+        self._run = LatencyHistogram()
+
+    def depth(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> QueueStats:
+        with self._lock:
+            return QueueStats(len(self._calls), self.max_depth, self.dropped, self.coalesced,
+                              self._wait.snapshot(), self._run.snapshot())
+
+    def wrap(self, callback: Callable, jog: bool = False) -> Callable:
+        return lambda *args: self.submit(callback, args, jog)
+
+    # Jog calls take (mode, value) or, from a JogCoalescer, (mode, value, count)
+    def _coalesce(self, callback: Callable, args: tuple) -> bool:
+        last = next((call for call in reversed(self._calls)
+                     if call.jog and call.callback == callback and call.args[0] == args[0]), None)
+        if last is None:
+            return False
+        mode, value = args[0], args[1]
+        if mode not in ABSOLUTE_JOG_MODES:
+            value += last.args[1]
+        if len(args) > 2:
+            last.args = (mode, value, last.args[2] + args[2])
+        else:
+            last.args = (mode, value)
+        self.coalesced += 1
+        return True
+
+    def submit(self, callback: Callable, args: tuple, jog: bool = False):
+        with self._lock:
+            if self.closed:
+                raise Exception("Callback queue is closed")
+            if len(self._calls) >= self.size:
+                if self.policy == OverflowPolicy.COALESCE_JOG and jog and self._coalesce(callback, args):
+                    return
+                if self.policy == OverflowPolicy.DROP_OLDEST:
+                    self._calls.popleft()
+                    self.dropped += 1
+                else:
+                    while len(self._calls) >= self.size:
+                        self._lock.wait()
+            self._calls.append(_Call(callback, args, jog))
+            self.max_depth = max(self.max_depth, len(self._calls))
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._executor._ready.put(self)
+
+    # Runs queued calls until the queue is empty or max_calls were run, then
+    # hands the queue back to the executor if anything is left
+    def _drain(self, max_calls: int):
+        for _ in range(max_calls):
+            with self._lock:
+                if not self._calls:
+                    self._scheduled = False
+                    self._lock.notify_all()
+                    return
+                call = self._calls.popleft()
+                self._lock.notify_all()
+            started = time.monotonic_ns()
+            try:
+                call.callback(*call.args)
+            except Exception:
+                print("Exception in callback {0}".format(call.callback), file=sys.stderr)
+                traceback.print_exc()
+            finished = time.monotonic_ns()
+            with self._lock:
+                self._wait.add(started - call.queued)
+                self._run.add(finished - started)
+        with self._lock:
+            if not self._calls:
+                self._scheduled = False
+                self._lock.notify_all()
+                return
+        self._executor._ready.put(self)
+
+    # Waits until all queued calls have run. Must not be called from one of
+    # the callbacks of this queue.
+    def join(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            return self._lock.wait_for(lambda: not self._calls and not self._scheduled, timeout)
+
+    # Rejects further calls and runs the ones already queued
+    def close(self, timeout: Optional[float] = None) -> bool:
+        with self._lock:
+            self.closed = True
+        return self.join(timeout)
+
+
+# A pool of worker threads running device callbacks off the reading thread.
+# Every device gets its own bounded CallbackQueue, so its events stay in
+# order, while the queues of different devices run in parallel. A worker runs
+# at most batch calls of one queue before moving on to the next one.
+class CallbackExecutor:
+    batch: int
+
+    _ready: queue.SimpleQueue[Optional[CallbackQueue]]
+    _workers: list[threading.Thread]
+
+    def __init__(self, workers: int = 1, batch: int = 16):
+        self.batch = batch
+        self._ready = queue.SimpleQueue()
+        self._workers = [threading.Thread(target=self._run, name="callbacks {0}".format(i), daemon=True)
+                         for i in range(workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+    def queue(self, size: int = 256, policy: OverflowPolicy = OverflowPolicy.BLOCK) -> CallbackQueue:
+        return CallbackQueue(self, size, policy)
+
+    def _run(self):
+        while True:
+            callback_queue = self._ready.get()
+            if callback_queue is None:
+                return
+            callback_queue._drain(self.batch)
+
+    # Calls still queued are not run, see CallbackQueue.join
+    def shutdown(self):
+        for _ in self._workers:
+            self._ready.put(None)
+        for worker in self._workers:
+            if worker is not threading.current_thread():
+                worker.join()
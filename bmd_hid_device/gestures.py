@@ -0,0 +1,197 @@
+import enum
+import heapq
+import time
+from typing import Callable, NamedTuple, Optional
+
+from .protocol.keymask import key_mask, keys_from_mask
+from .protocol.types import BmdHidKey
+from .subscriptions import Subscription
+
+
+class GestureKind(enum.Enum):
+    TAP = 0
+    DOUBLE_TAP = 1
+    LONG_PRESS = 2
+    REPEAT = 3
+    CHORD = 4
+
+
+class GestureEvent(NamedTuple):
+    kind: GestureKind
+    keys: tuple[BmdHidKey, ...]
+    # monotonic ns of the press that started the gesture and of its detection
+    started: int
+    timestamp: int
+    # Number of the repeat, 0 for everything else
+    count: int = 0
+
+
+# Thresholds in ms. A double_tap of 0 reports taps on release instead of
+# waiting whether a second press follows, repeat_interval None disables
+# auto-repeat.
+class GestureTiming(NamedTuple):
+    double_tap: int = 250
+    long_press: int = 500
+    repeat_delay: int = 500
+    repeat_interval: Optional[int] = None
+
+
+class _KeyState:
+    generation: int = 0
+    pressed: int = 0
+    first_press: int = 0
+    tap_pending: bool = False
+    second_press: bool = False
+    consumed: bool = False
+    repeats: int = 0
+
+
+class _Deadline(enum.Enum):
+    TAP = 0
+    LONG_PRESS = 1
+    REPEAT = 2
+
+
+# Detects taps, double taps, long presses, auto-repeat and chords from key
+# down/up transitions. The hardware does none of this. All pending deadlines of
+# all keys share one heap; cancelled ones stay in it and are skipped through a
+# per-key generation. It is a TimerSource, so the poll loop of the device it
+# is attached to drives it.
+class GestureEngine:
+    on_gesture: Callable[[GestureEvent], None]
+    timing: GestureTiming
+
+    held_mask: int
+
+    _timings: dict[BmdHidKey, GestureTiming]
+    _chords: list[int]
+    _keys: dict[BmdHidKey, _KeyState]
+    _deadlines: list[tuple[int, int, BmdHidKey, _Deadline, int]]
+    _sequence: int
+    _subscriptions: list[Subscription]
+
+    def __init__(self, on_gesture: Callable[[GestureEvent], None], timing: GestureTiming = GestureTiming()):
+        self.on_gesture = on_gesture
+        self.timing = timing
+        self.held_mask = 0
+        self._timings = {}
+        self._chords = []
+        self._keys = {}
+        self._deadlines = []
+        self._sequence = 0
+        self._subscriptions = []
+
+    def set_timing(self, key: BmdHidKey, timing: Optional[GestureTiming]):
+        if timing is None:
+            self._timings.pop(key, None)
+        else:
+            self._timings[key] = timing
+
+    def add_chord(self, *keys: BmdHidKey):
+        self._chords.append(key_mask(*keys))
+
+    def remove_chord(self, *keys: BmdHidKey):
+        self._chords.remove(key_mask(*keys))
+
+    def attach(self, device):
+        self._subscriptions = [
+            device.subscriptions.on_key_down(self.key_down),
+            device.subscriptions.on_key_up(self.key_up),
+        ]
+        device.add_timer(self)
+
+    def detach(self, device):
+        for subscription in self._subscriptions:
+            device.subscriptions.unsubscribe(subscription)
+        self._subscriptions = []
+        device.remove_timer(self)
+
+    def _state(self, key: BmdHidKey) -> _KeyState:
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = _KeyState()
+        return state
+
+    def _schedule(self, key: BmdHidKey, kind: _Deadline, deadline: int, generation: int):
+        self._sequence += 1
+        heapq.heappush(self._deadlines, (deadline, self._sequence, key, kind, generation))
+
+    def key_down(self, key: BmdHidKey, now: Optional[int] = None):
+        if now is None:
+            now = time.monotonic_ns()
+        timing = self._timings.get(key, self.timing)
+        state = self._state(key)
+        state.generation += 1
+        state.pressed = now
+        state.second_press = state.tap_pending
+        if not state.tap_pending:
+            state.first_press = now
+        state.tap_pending = False
+        state.consumed = False
+        state.repeats = 0
+        self._schedule(key, _Deadline.LONG_PRESS, now + timing.long_press * 1_000_000, state.generation)
+        if timing.repeat_interval is not None:
+            self._schedule(key, _Deadline.REPEAT, now + timing.repeat_delay * 1_000_000, state.generation)
+
+        held = self.held_mask | (1 << key)
+        for chord in self._chords:
+            if held & chord == chord and self.held_mask & chord != chord:
+                keys = tuple(keys_from_mask(chord))
+                started = now
+                for chord_key in keys:
+                    chord_state = self._state(chord_key)
+                    chord_state.generation += 1
+                    chord_state.consumed = True
+                    chord_state.tap_pending = False
+                    started = min(started, chord_state.pressed)
+                self.on_gesture(GestureEvent(GestureKind.CHORD, keys, started, now))
+        self.held_mask = held
+
+    def key_up(self, key: BmdHidKey, now: Optional[int] = None):
+        if now is None:
+            now = time.monotonic_ns()
+        self.held_mask &= ~(1 << key)
+        state = self._state(key)
+        state.generation += 1
+        if state.consumed:
+            return
+        if state.second_press:
+            state.second_press = False
+            self.on_gesture(GestureEvent(GestureKind.DOUBLE_TAP, (key,), state.first_press, now))
+            return
+        timing = self._timings.get(key, self.timing)
+        if timing.double_tap:
+            state.tap_pending = True
+            self._schedule(key, _Deadline.TAP, now + timing.double_tap * 1_000_000, state.generation)
+        else:
+            self.on_gesture(GestureEvent(GestureKind.TAP, (key,), state.first_press, now))
+
+    def next_deadline(self) -> Optional[int]:
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][4] != self._keys[deadlines[0][2]].generation:
+            heapq.heappop(deadlines)
+        if not deadlines:
+            return None
+        return deadlines[0][0]
+
+    def service(self, now: int):
+        deadlines = self._deadlines
+        while deadlines and deadlines[0][0] <= now:
+            deadline, _, key, kind, generation = heapq.heappop(deadlines)
+            state = self._keys[key]
+            if generation != state.generation:
+                continue
+            if kind == _Deadline.TAP:
+                state.tap_pending = False
+                self.on_gesture(GestureEvent(GestureKind.TAP, (key,), state.first_press, deadline))
+            elif kind == _Deadline.LONG_PRESS:
+                state.consumed = True
+                state.second_press = False
+                self.on_gesture(GestureEvent(GestureKind.LONG_PRESS, (key,), state.pressed, deadline))
+            elif kind == _Deadline.REPEAT:
+                state.consumed = True
+                state.second_press = False
+                state.repeats += 1
+                timing = self._timings.get(key, self.timing)
+                self._schedule(key, _Deadline.REPEAT, deadline + timing.repeat_interval * 1_000_000, generation)
+                self.on_gesture(GestureEvent(GestureKind.REPEAT, (key,), state.pressed, deadline, state.repeats))
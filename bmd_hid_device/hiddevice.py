@@ -1,31 +1,80 @@
 import abc
-from typing import Optional
+import time
+from typing import Callable, Optional
 
+from .batch import EventBatch
+from .executor import CallbackExecutor, CallbackQueue, OverflowPolicy
 from .inputhandler import InputEventHandler
+from .jogcoalescer import JogCoalescer
+from .jogestimator import JogEstimator
 from .ledstatehandler import LedStateHandler
-from .protocol.events import OnJogEvent, OnKeyEvent, OnBatteryEvent
+from .protocol.events import OnJogEvent, OnInputEvent
+from .protocol.keymask import key_mask, keys_from_mask
 from .protocol.requests import SetLedRequest, SetJogLedRequest, SetJogModeRequest
 from .protocol.types import BmdHidJogMode, BmdHidKey, BmdHidLed, BmdHidJogLed
 from .rawdevice import BmdRawDevice
+from .runloop import RunLoop
+from .subscriptions import EventSubscriptions, Subscription, SubscriptionKind
+from .util.capture import SessionRecorder
 from .util.deviceinfo import HidDeviceInfo
+from .util.stats import DeviceStats, StatsSnapshot
+from .util.timeout import TimerSource, bounded_timeout
 
 
 class BmdHidDevice(abc.ABC):
     _device: BmdRawDevice
     _input: InputEventHandler
+    subscriptions: EventSubscriptions
+    callback_queue: Optional[CallbackQueue]
+    _callbacks: list[Subscription]
     leds: LedStateHandler
-    held_keys: list[BmdHidKey]
+    jog_mode: Optional[BmdHidJogMode]
+    _jog_coalescer: Optional[JogCoalescer]
+    _emit_jog: Callable[[BmdHidJogMode, int], None]
+    _emit_coalesced_jog: Callable[[BmdHidJogMode, int, int], None]
+    jog_estimator: Optional[JogEstimator]
+    _jog_subscription: Optional[Subscription]
+    _timers: list[TimerSource]
+    stats: Optional[DeviceStats]
 
-    def __init__(self, device_info: HidDeviceInfo):
-        self._device = BmdRawDevice(device_info)
-        self.held_keys = []
+    # Callbacks of these kinds are not subscribed, so reports that only they
+    # would handle are dropped before being decoded
+    ignored_callbacks: frozenset[SubscriptionKind] = frozenset()
 
-        self._input = InputEventHandler(self.on_key_down, self.on_key_up)
+    def __init__(self, device_info: HidDeviceInfo, device: Optional[BmdRawDevice] = None):
+        self._device = device if device is not None else self._open(device_info)
+        self.jog_mode = None
+        self._jog_coalescer = None
+        self.jog_estimator = None
+        self._jog_subscription = None
+        self.subscriptions = EventSubscriptions()
+        self.callback_queue = None
+        self._callbacks = []
+        self._emit_jog = self.on_jog_event
+        self._emit_coalesced_jog = self.on_coalesced_jog_event
+        self._subscribe_callbacks(self.on_key_down, self.on_key_up, self.on_battery)
+        self._input = self.subscriptions.input
         self.leds = LedStateHandler(self._on_update_system_leds, self._on_update_jog_leds)
+        self._timers = [self.leds]
+        self.stats = None
 
     def device_info(self) -> HidDeviceInfo:
         return self._device.device_info
 
+    @property
+    def held_keys(self) -> list[BmdHidKey]:
+        return keys_from_mask(self._input.held_mask)
+
+    @property
+    def held_mask(self) -> int:
+        return self._input.held_mask
+
+    def is_held(self, key: BmdHidKey) -> bool:
+        return self._input.is_held(key)
+
+    def is_chord_held(self, *keys: BmdHidKey, exact: bool = False) -> bool:
+        return self._input.is_chord_held(key_mask(*keys), exact)
+
     def __str__(self):
         return "BmdHidDevice({0}, timeout {1} sec)".format(self._device, self._device.timeout)
 
@@ -34,8 +83,61 @@ class BmdHidDevice(abc.ABC):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.leds.clear()
+        self.leds.flush(force=True)
         self.close()
 
+    def _open(self, device_info: HidDeviceInfo) -> BmdRawDevice:
+        return BmdRawDevice(device_info)
+
+    def reconnect(self, device_info: Optional[HidDeviceInfo] = None):
+        if not self._device.isclosed():
+            self._device.close()
+        recorder = self._device.recorder
+        self._device = self._open(device_info if device_info is not None else self._device.device_info)
+        self._device.recorder = recorder
+        self._device.stats = self.stats
+        # Keys held while the device went away never got their key up event
+        self._input.update_mask(0)
+        if self.jog_mode is not None:
+            self.set_jog_mode(self.jog_mode)
+        self.leds.replay()
+
+    # Hands re-authentication over to the caller, who then has to call
+    # reauthenticate() before half of timeout() has passed. False if the device
+    # takes care of it itself, like ThreadedRawDevice.
+    def stop_refresh(self) -> bool:
+        authenticator = getattr(self._device, "authenticator", None)
+        if authenticator is None:
+            return False
+        authenticator.stop()
+        return True
+
+    def reauthenticate(self) -> int:
+        return self._device.reauthenticate()
+
+    def timeout(self) -> int:
+        return self._device.timeout
+
+    def record(self, recorder: Optional[SessionRecorder]):
+        self._device.recorder = recorder
+
+    def enable_stats(self,
+                     on_export: Optional[Callable[[StatsSnapshot], None]] = None,
+                     export_interval: Optional[int] = None) -> DeviceStats:
+        self.disable_stats()
+        self.stats = DeviceStats(on_export, export_interval)
+        self._device.stats = self.stats
+        self.subscriptions.stats = self.stats
+        self.add_timer(self.stats)
+        return self.stats
+
+    def disable_stats(self):
+        if self.stats is not None:
+            self.remove_timer(self.stats)
+            self.stats = None
+            self._device.stats = None
+            self.subscriptions.stats = None
+
     def isclosed(self):
         return self._device.isclosed()
 
@@ -58,7 +160,81 @@ class BmdHidDevice(abc.ABC):
     def on_battery(self, charging: bool, level: int):
         pass
 
+    # Called instead of on_jog_event while jog coalescing is enabled
+    def on_coalesced_jog_event(self, mode: BmdHidJogMode, value: int, count: int):
+        self.on_jog_event(mode, value)
+
+    def coalesce_jog(self, window: Optional[float] = None, max_rate: Optional[float] = None):
+        if self._jog_coalescer is not None:
+            self._jog_coalescer.flush()
+            self.remove_timer(self._jog_coalescer)
+            self._jog_coalescer = None
+        if window is not None or max_rate is not None:
+            self._jog_coalescer = JogCoalescer(self._flush_jog, window, max_rate)
+            self.add_timer(self._jog_coalescer)
+
+    # Estimates velocity and acceleration from the uncoalesced jog reports
+    def track_jog(self, size: int = 64, window: float = 50, smoothing: float = 0.5) -> JogEstimator:
+        self.untrack_jog()
+        self.jog_estimator = JogEstimator(size, window, smoothing)
+        self.jog_estimator.reset(self.jog_mode)
+        self._jog_subscription = self.subscriptions.on_jog(self.jog_estimator.add)
+        return self.jog_estimator
+
+    def untrack_jog(self):
+        if self.jog_estimator is not None:
+            self.subscriptions.unsubscribe(self._jog_subscription)
+            self._jog_subscription = None
+            self.jog_estimator = None
+
+    # Jog events always go through _on_jog on the polling thread, so they are
+    # coalesced there and only the coalesced events reach _emit_jog
+    def _subscribe_callbacks(self, on_key_down, on_key_up, on_battery):
+        for subscription in self._callbacks:
+            self.subscriptions.unsubscribe(subscription)
+        callbacks = [
+            (SubscriptionKind.JOG, self._on_jog),
+            (SubscriptionKind.KEY_DOWN, on_key_down),
+            (SubscriptionKind.KEY_UP, on_key_up),
+            (SubscriptionKind.BATTERY, on_battery),
+        ]
+        self._callbacks = [self.subscriptions.subscribe(kind, handler)
+                           for kind, handler in callbacks if kind not in self.ignored_callbacks]
+
+    # Runs the callbacks on the workers of executor instead of the polling
+    # thread, in order, through a queue of queue_size events. Without
+    # executor the callbacks run inline again. The queue used before is closed
+    # once the calls still in it have run; the executor itself may be shared
+    # with other devices and keeps running.
+    def use_executor(self,
+                     executor: Optional[CallbackExecutor],
+                     queue_size: int = 256,
+                     policy: OverflowPolicy = OverflowPolicy.BLOCK) -> Optional[CallbackQueue]:
+        if self._jog_coalescer is not None:
+            self._jog_coalescer.flush()
+        previous = self.callback_queue
+        if executor is None:
+            self.callback_queue = None
+            self._emit_jog = self.on_jog_event
+            self._emit_coalesced_jog = self.on_coalesced_jog_event
+            self._subscribe_callbacks(self.on_key_down, self.on_key_up, self.on_battery)
+        else:
+            self.callback_queue = executor.queue(queue_size, policy)
+            self._emit_jog = self.callback_queue.wrap(self.on_jog_event, jog=True)
+            self._emit_coalesced_jog = self.callback_queue.wrap(self.on_coalesced_jog_event, jog=True)
+            self._subscribe_callbacks(
+                self.callback_queue.wrap(self.on_key_down),
+                self.callback_queue.wrap(self.on_key_up),
+                self.callback_queue.wrap(self.on_battery),
+            )
+        if previous is not None:
+            previous.close()
+        return self.callback_queue
+
     def set_jog_mode(self, mode: BmdHidJogMode):
+        self.jog_mode = mode
+        if self.jog_estimator is not None:
+            self.jog_estimator.reset(mode)
         self._device.send(SetJogModeRequest(mode, 0))
 
     def _on_update_system_leds(self, leds: BmdHidLed):
@@ -67,29 +243,93 @@ class BmdHidDevice(abc.ABC):
     def _on_update_jog_leds(self, leds: BmdHidJogLed):
         self._device.send(SetJogLedRequest(leds))
 
-    def poll(self, timeout: Optional[int] = None) -> bool:
-        message = self._device.poll(timeout)
-        if message is None:
-            return False
-        if isinstance(message, OnJogEvent):
-            self.on_jog_event(message.mode, message.value)
-        elif isinstance(message, OnKeyEvent):
-            self._input.update(set(message.keys))
-            self.held_keys = message.keys
-        elif isinstance(message, OnBatteryEvent):
-            self.on_battery(message.charging, message.level)
+    def _on_jog(self, mode: BmdHidJogMode, value: int):
+        if self._jog_coalescer is not None:
+            self._jog_coalescer.add(mode, value)
         else:
-            raise Exception("Unhandled message {0}".format(type(message)))
-        return True
+            self._emit_jog(mode, value)
+
+    def _flush_jog(self, mode: BmdHidJogMode, value: int, count: int):
+        self._emit_coalesced_jog(mode, value, count)
+
+    def dispatch(self, message: OnInputEvent):
+        # Nothing may overtake jog events that are still pending
+        if self._jog_coalescer is not None and not isinstance(message, OnJogEvent):
+            self._jog_coalescer.flush()
+        self.subscriptions.dispatch(message)
+
+    def dispatch_report(self, data: bytes):
+        if self._jog_coalescer is not None and data[0] != OnJogEvent.id():
+            self._jog_coalescer.flush()
+        self.subscriptions.dispatch_report(data)
+
+    # Timers are serviced from poll, see TimerSource
+    def add_timer(self, timer: TimerSource):
+        self._timers.append(timer)
+
+    def remove_timer(self, timer: TimerSource):
+        self._timers.remove(timer)
+
+    def next_deadline(self) -> Optional[int]:
+        deadline = None
+        for timer in self._timers:
+            next_deadline = timer.next_deadline()
+            if next_deadline is not None and (deadline is None or next_deadline < deadline):
+                deadline = next_deadline
+        return deadline
+
+    def service(self, now: int):
+        for timer in self._timers:
+            timer.service(now)
+
+    def _service_timers(self):
+        self.service(time.monotonic_ns())
+
+    def poll(self, timeout: Optional[int] = None) -> bool:
+        deadline = self.next_deadline()
+        if deadline is not None:
+            timeout = bounded_timeout(timeout, deadline)
+        data = self._device.read_report(timeout)
+        if data is not None:
+            if self.stats is None:
+                self.dispatch_report(data)
+            else:
+                read = time.monotonic_ns()
+                self.dispatch_report(data)
+                self.stats.dispatched(data[0], read, time.monotonic_ns())
+        if deadline is not None:
+            self._service_timers()
+        return data is not None
+
+    # Reads all pending reports into batch without running any callbacks,
+    # returns the number of reports added. Timers that are due are serviced
+    # first; see dispatch_batch for running the callbacks afterwards.
+    def poll_batch(self, batch: EventBatch, max_events: Optional[int] = None) -> int:
+        deadline = self.next_deadline()
+        if deadline is not None and deadline <= time.monotonic_ns():
+            self._service_timers()
+        start = batch.count
+        end = batch.capacity if max_events is None else min(batch.capacity, start + max_events)
+        read_report = self._device.read_report
+        stats = self.stats
+        while batch.count < end:
+            data = read_report(0)
+            if data is None:
+                break
+            read = time.monotonic_ns()
+            batch.append(data, read)
+            if stats is not None:
+                stats.parsed(data[0], read, time.monotonic_ns())
+        return batch.count - start
+
+    def dispatch_batch(self, batch: EventBatch, start: int = 0):
+        flush = None if self._jog_coalescer is None else self._jog_coalescer.flush
+        self.subscriptions.dispatch_batch(batch, start, flush)
 
     def poll_available(self):
         while self.poll(0):
             pass
 
+    # Re-authentication moves onto the polling thread as well
     def poll_forever(self):
-        while True:
-            try:
-                self.poll()
-            except KeyboardInterrupt:
-                print("Thread interrupted via keyboard")
-                break
+        RunLoop([self]).run_forever()
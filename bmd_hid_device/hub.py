@@ -0,0 +1,177 @@
+import heapq
+import queue
+import sys
+import time
+from typing import Optional, NamedTuple, Iterator
+
+import hid
+
+from .protocol.events import OnInputEvent, OnInputEvents
+from .protocol.requests import SetConfigRequest
+from .rawdevice import BmdRawDevice
+from .util.deviceinfo import HidDeviceInfo
+from .util.messagehandler import MessageHandler
+from .util.timeout import Timeout
+
+
+class HubEvent(NamedTuple):
+    timestamp: int
+    serial: str
+    event: OnInputEvent
+
+
+class HubReport(NamedTuple):
+    timestamp: int
+    serial: str
+    data: bytes
+
+
+# Services any number of raw devices from a single thread. Reads are done
+# without blocking across all devices, re-authentication is scheduled by
+# deadline instead of one timer thread per device, and writes queued from
+# other threads are flushed in between reads.
+class DeviceHub:
+    idle_interval: int
+
+    _devices: dict[str, BmdRawDevice]
+    _deadlines: list[tuple[int, str]]
+    _writes: queue.Queue[tuple[str, SetConfigRequest]]
+    _parser: MessageHandler[OnInputEvent]
+
+    def __init__(self, idle_interval: int = 1):
+        self.idle_interval = idle_interval
+        self._devices = {}
+        self._deadlines = []
+        self._writes = queue.Queue()
+        self._parser = MessageHandler(OnInputEvents)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __len__(self):
+        return len(self._devices)
+
+    def serials(self) -> list[str]:
+        return list(self._devices)
+
+    def device(self, serial: str) -> BmdRawDevice:
+        return self._devices[serial]
+
+    def open(self, device_info: HidDeviceInfo) -> BmdRawDevice:
+        device = BmdRawDevice(device_info, auto_refresh=False)
+        self.add(device)
+        return device
+
+    def add(self, device: BmdRawDevice):
+        serial = device.device_info["serial_number"]
+        if device.authenticator is not None:
+            device.authenticator.stop()
+        self._unschedule_refresh(serial)
+        self._devices[serial] = device
+        self._schedule_refresh(serial, device)
+
+    def remove(self, serial: str) -> Optional[BmdRawDevice]:
+        self._unschedule_refresh(serial)
+        return self._devices.pop(serial, None)
+
+    def close(self):
+        for device in self._devices.values():
+            device.close()
+        self._devices.clear()
+        self._deadlines.clear()
+
+    def send(self, serial: str, message: SetConfigRequest):
+        self._writes.put((serial, message))
+
+    def _schedule_refresh(self, serial: str, device: BmdRawDevice):
+        deadline = time.monotonic_ns() + device.timeout * 500_000_000
+        heapq.heappush(self._deadlines, (deadline, serial))
+
+    # Each serial has at most one deadline, even if it is removed and added again
+    def _unschedule_refresh(self, serial: str):
+        deadlines = [entry for entry in self._deadlines if entry[1] != serial]
+        if len(deadlines) != len(self._deadlines):
+            heapq.heapify(deadlines)
+            self._deadlines = deadlines
+
+    def _fail(self, serial: str, e: hid.HIDException):
+        print("Removing device {0}: {1}".format(serial, e), file=sys.stderr)
+        self.remove(serial)
+
+    def _service_writes(self):
+        while True:
+            try:
+                serial, message = self._writes.get_nowait()
+            except queue.Empty:
+                return
+            device = self._devices.get(serial)
+            if device is None:
+                continue
+            try:
+                device.send(message)
+            except hid.HIDException as e:
+                self._fail(serial, e)
+
+    def _service_refresh(self):
+        now = time.monotonic_ns()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, serial = heapq.heappop(self._deadlines)
+            device = self._devices.get(serial)
+            if device is None:
+                continue
+            try:
+                device.reauthenticate()
+            except hid.HIDException as e:
+                self._fail(serial, e)
+                continue
+            self._schedule_refresh(serial, device)
+
+    def _read(self, reports: list[HubReport], timeout: int):
+        for serial, device in list(self._devices.items()):
+            try:
+                data = device.read_report(timeout)
+            except hid.HIDException as e:
+                self._fail(serial, e)
+                continue
+            if data is not None:
+                reports.append(HubReport(time.monotonic_ns(), serial, data))
+
+    def _idle_timeout(self, deadline: Timeout) -> int:
+        timeout = self.idle_interval
+        if deadline.deadline is not None:
+            timeout = min(timeout, (deadline.deadline - time.monotonic_ns()) // 1_000_000)
+        if self._deadlines:
+            timeout = min(timeout, (self._deadlines[0][0] - time.monotonic_ns()) // 1_000_000)
+        return max(timeout, 0)
+
+    # Raw input reports, for passing them on without decoding them
+    def poll_reports(self, timeout: Optional[int] = None) -> list[HubReport]:
+        deadline = Timeout(timeout)
+        reports = []
+        while True:
+            self._service_writes()
+            self._service_refresh()
+            self._read(reports, 0)
+            if reports or not deadline.remaining() or not self._devices:
+                return reports
+            idle = self._idle_timeout(deadline)
+            if len(self._devices) == 1:
+                # A single device can block in read instead of sleeping
+                self._read(reports, idle)
+            elif idle > 0:
+                time.sleep(idle / 1000)
+
+    def poll(self, timeout: Optional[int] = None) -> list[HubEvent]:
+        events = []
+        for report in self.poll_reports(timeout):
+            message = self._parser.parse(report.data)
+            if message is not None:
+                events.append(HubEvent(report.timestamp, report.serial, message))
+        return events
+
+    def events(self) -> Iterator[HubEvent]:
+        while self._devices:
+            yield from self.poll()
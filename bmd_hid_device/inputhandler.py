@@ -1,5 +1,6 @@
 from typing import Callable
 
+from .protocol.keymask import key_mask, keys_from_mask
 from .protocol.types import BmdHidKey
 
 
@@ -7,16 +8,37 @@ class InputEventHandler:
     on_key_down: Callable[[BmdHidKey], None]
     on_key_up: Callable[[BmdHidKey], None]
 
-    keys: set[BmdHidKey] = set()
+    held_mask: int
 
     def __init__(self, on_key_down, on_key_up):
         self.on_key_down = on_key_down
         self.on_key_up = on_key_up
+        self.held_mask = 0
+
+    @property
+    def keys(self) -> set[BmdHidKey]:
+        return set(keys_from_mask(self.held_mask))
+
+    def is_held(self, key: BmdHidKey) -> bool:
+        return (self.held_mask >> key) & 1 == 1
+
+    # With exact, no other key may be held apart from the chord
+    def is_chord_held(self, chord: int, exact: bool = False) -> bool:
+        if exact:
+            return self.held_mask == chord
+        return self.held_mask & chord == chord
 
     def update(self, keys: set[BmdHidKey]):
-        removed = self.keys - keys
-        added = keys - self.keys
-        self.keys = keys
+        self.update_mask(key_mask(*keys))
+
+    def update_mask(self, mask: int):
+        changed = self.held_mask ^ mask
+        if not changed:
+            return
+        # Unknown keys raise before any state changes
+        removed = keys_from_mask(changed & self.held_mask)
+        added = keys_from_mask(changed & mask)
+        self.held_mask = mask
         for key in removed:
             self.on_key_up(key)
         for key in added:
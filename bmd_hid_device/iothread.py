@@ -0,0 +1,208 @@
+import queue
+import threading
+import time
+from typing import Optional
+
+import hid
+
+from .protocol.events import OnInputEvent
+from .protocol.requests import SetConfigRequest
+from .rawdevice import BmdRawDevice
+from .util.capture import SessionRecorder
+from .util.deviceinfo import HidDeviceInfo
+from .util.stats import DeviceStats
+
+
+class WriteTicket:
+    message: SetConfigRequest
+    enqueued: int
+    started: Optional[int]
+    finished: Optional[int]
+    error: Optional[Exception]
+
+    _done: threading.Event
+
+    def __init__(self, message: SetConfigRequest):
+        self.message = message
+        self.enqueued = time.monotonic_ns()
+        self.started = None
+        self.finished = None
+        self.error = None
+        self._done = threading.Event()
+
+    def __str__(self):
+        return "WriteTicket({0}, waited {1} ns)".format(self.message, self.queue_wait())
+
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    # Time between send() and the I/O thread picking up the write
+    def queue_wait(self) -> Optional[int]:
+        if self.started is None:
+            return None
+        return self.started - self.enqueued
+
+    def _finish(self, error: Optional[Exception] = None):
+        self.finished = time.monotonic_ns()
+        self.error = error
+        self._done.set()
+
+
+# Owns a raw device and does all I/O on it from one thread: queued writes are
+# flushed and re-authentication is done in between reads, input reports are
+# handed over through a queue. hidapi reads can't be interrupted, so the I/O
+# thread reads in slices of read_slice ms, which bounds the extra latency of
+# writes and re-authentication. Offers the same poll/send interface as
+# BmdRawDevice, so it can be passed to BmdHidDevice as device.
+class ThreadedRawDevice:
+    read_slice: int
+    write_timeout: int
+    error: Optional[Exception]
+
+    _raw: BmdRawDevice
+    _writes: queue.Queue[WriteTicket]
+    _reports: queue.Queue[bytes]
+    _refresh_deadline: int
+    _running: bool
+    _thread: threading.Thread
+
+    def __init__(self, raw: BmdRawDevice, queue_size: int = 64, read_slice: int = 5, write_timeout: int = 1000):
+        if raw.authenticator is not None:
+            raw.authenticator.stop()
+        self.read_slice = read_slice
+        self.write_timeout = write_timeout
+        self.error = None
+        self._raw = raw
+        self._writes = queue.Queue(queue_size)
+        self._reports = queue.Queue()
+        self._schedule_refresh()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="io {0}".format(raw), daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def open(device_info: HidDeviceInfo,
+             queue_size: int = 64,
+             read_slice: int = 5,
+             write_timeout: int = 1000) -> 'ThreadedRawDevice':
+        return ThreadedRawDevice(BmdRawDevice(device_info, auto_refresh=False), queue_size, read_slice, write_timeout)
+
+    def __str__(self):
+        return str(self._raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def device_info(self) -> HidDeviceInfo:
+        return self._raw.device_info
+
+    @property
+    def timeout(self) -> int:
+        return self._raw.timeout
+
+    @property
+    def recorder(self) -> Optional[SessionRecorder]:
+        return self._raw.recorder
+
+    @recorder.setter
+    def recorder(self, recorder: Optional[SessionRecorder]):
+        self._raw.recorder = recorder
+
+    @property
+    def stats(self) -> Optional[DeviceStats]:
+        return self._raw.stats
+
+    @stats.setter
+    def stats(self, stats: Optional[DeviceStats]):
+        self._raw.stats = stats
+
+    def queue_depth(self) -> int:
+        return self._writes.qsize()
+
+    def isclosed(self):
+        return not self._running or self._raw.isclosed()
+
+    # Writes queued before close are still sent, see _run
+    def close(self):
+        self._running = False
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._raw.close()
+        self._fail_pending(hid.HIDException("device is closed"))
+        self._reports.put(b'')
+
+    # Waits up to write_timeout ms for room in the write queue
+    def send(self, message: SetConfigRequest) -> WriteTicket:
+        if self.isclosed():
+            raise hid.HIDException("device is closed")
+        ticket = WriteTicket(message)
+        try:
+            self._writes.put(ticket, timeout=self.write_timeout / 1000)
+        except queue.Full:
+            raise hid.HIDException("write queue is full")
+        return ticket
+
+    def read_report(self, timeout: Optional[int] = None) -> Optional[bytes]:
+        try:
+            data = self._reports.get(timeout=None if timeout is None else timeout / 1000)
+        except queue.Empty:
+            return None
+        if not data:
+            # The I/O thread has stopped, leave the marker for other readers
+            self._reports.put(data)
+            raise hid.HIDException("device is closed") from self.error
+        return data
+
+    def poll(self, timeout: Optional[int] = None) -> Optional[OnInputEvent]:
+        data = self.read_report(timeout)
+        if data is None:
+            return None
+        return self._raw.on_input_event_handler.parse(data)
+
+    def _schedule_refresh(self):
+        self._refresh_deadline = time.monotonic_ns() + self._raw.timeout * 500_000_000
+
+    def _fail_pending(self, error: Exception):
+        while True:
+            try:
+                self._writes.get_nowait()._finish(error)
+            except queue.Empty:
+                return
+
+    def _flush_writes(self):
+        while True:
+            try:
+                ticket = self._writes.get_nowait()
+            except queue.Empty:
+                return
+            ticket.started = time.monotonic_ns()
+            try:
+                self._raw.send(ticket.message)
+            except hid.HIDException as e:
+                ticket._finish(e)
+                raise e
+            ticket._finish()
+
+    def _run(self):
+        try:
+            while self._running:
+                self._flush_writes()
+                if time.monotonic_ns() >= self._refresh_deadline:
+                    self._raw.reauthenticate()
+                    self._schedule_refresh()
+                data = self._raw.read_report(self.read_slice)
+                if data is not None:
+                    self._reports.put(data)
+            self._flush_writes()
+        except hid.HIDException as e:
+            self.error = e
+            self._running = False
+            self._fail_pending(e)
+            self._reports.put(b'')
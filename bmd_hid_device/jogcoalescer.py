@@ -0,0 +1,73 @@
+import time
+from typing import Callable, Optional
+
+from .protocol.types import BmdHidJogMode
+
+ABSOLUTE_JOG_MODES = (BmdHidJogMode.ABSOLUTE, BmdHidJogMode.ABSOLUTE_DEADZONE)
+
+
+# Limits jog dispatch to one event per window. A report arriving after a quiet
+# window is delivered right away, reports arriving faster are merged and
+# delivered when the window ends: relative deltas are summed, absolute modes
+# keep the latest position. The count of merged reports is passed along.
+# Times are monotonic ns taken from clock unless passed in.
+class JogCoalescer:
+    window: int
+    on_flush: Callable[[BmdHidJogMode, int, int], None]
+    clock: Callable[[], int]
+
+    _mode: Optional[BmdHidJogMode]
+    _value: int
+    _count: int
+    _last_flush: int
+
+    def __init__(self,
+                 on_flush: Callable[[BmdHidJogMode, int, int], None],
+                 window: Optional[float] = None,
+                 max_rate: Optional[float] = None,
+                 clock: Callable[[], int] = time.monotonic_ns):
+        if window is None and max_rate is None:
+            raise ValueError("Either window or max_rate is required")
+        self.window = int(window * 1_000_000) if window is not None else int(1_000_000_000 / max_rate)
+        self.on_flush = on_flush
+        self.clock = clock
+        self._mode = None
+        self._value = 0
+        self._count = 0
+        self._last_flush = 0
+
+    def pending(self) -> int:
+        return self._count
+
+    def add(self, mode: BmdHidJogMode, value: int, now: Optional[int] = None):
+        if now is None:
+            now = self.clock()
+        if self._count and mode != self._mode:
+            self.flush(now)
+        if self._count and mode not in ABSOLUTE_JOG_MODES:
+            self._value += value
+        else:
+            self._value = value
+        self._mode = mode
+        self._count += 1
+        if now >= self._last_flush + self.window:
+            self.flush(now)
+
+    def flush(self, now: Optional[int] = None):
+        if not self._count:
+            return
+        mode, value, count = self._mode, self._value, self._count
+        self._mode = None
+        self._value = 0
+        self._count = 0
+        self._last_flush = now if now is not None else self.clock()
+        self.on_flush(mode, value, count)
+
+    def next_deadline(self) -> Optional[int]:
+        if not self._count:
+            return None
+        return self._last_flush + self.window
+
+    def service(self, now: int):
+        if self._count and now >= self._last_flush + self.window:
+            self.flush(now)
@@ -0,0 +1,106 @@
+import time
+from array import array
+from typing import NamedTuple, Optional
+
+from .jogcoalescer import ABSOLUTE_JOG_MODES
+from .protocol.types import BmdHidJogMode
+
+
+class JogEstimate(NamedTuple):
+    # Jog units, per second and per second squared
+    position: int
+    velocity: float
+    acceleration: float
+    direction: int
+
+
+# Velocity and acceleration of the jog wheel from the last size samples. Relative
+# modes are integrated into a position, absolute modes report one already.
+# Velocity is taken over the samples of the last window ms, which the ring
+# buffer keeps a moving tail index into, and then exponentially smoothed:
+# smoothing 0 uses the raw value, values towards 1 weigh the history more.
+# A mode switch starts over, as absolute positions restart from zero.
+class JogEstimator:
+    window: int
+    smoothing: float
+
+    mode: Optional[BmdHidJogMode]
+    position: int
+    velocity: float
+    acceleration: float
+
+    _times: array
+    _positions: array
+    _size: int
+    _head: int
+    _tail: int
+
+    def __init__(self, size: int = 64, window: float = 50, smoothing: float = 0.5):
+        if size < 2:
+            raise ValueError("size must be at least 2")
+        if not 0 <= smoothing < 1:
+            raise ValueError("smoothing must be in [0, 1)")
+        self.window = int(window * 1_000_000)
+        self.smoothing = smoothing
+        self._size = size
+        self._times = array('q', bytes(8 * size))
+        self._positions = array('q', bytes(8 * size))
+        self.reset()
+
+    def reset(self, mode: Optional[BmdHidJogMode] = None):
+        self.mode = mode
+        self.position = 0
+        self.velocity = 0.0
+        self.acceleration = 0.0
+        self._head = 0
+        self._tail = 0
+
+    def add(self, mode: BmdHidJogMode, value: int, now: Optional[int] = None):
+        if now is None:
+            now = time.monotonic_ns()
+        if mode != self.mode:
+            self.reset(mode)
+        if mode in ABSOLUTE_JOG_MODES:
+            self.position = value
+        else:
+            self.position += value
+
+        size = self._size
+        head = self._head
+        if head:
+            # Keep at least the previous sample, the oldest one is overwritten next
+            tail = max(self._tail, head - size + 1)
+            horizon = now - self.window
+            while tail < head - 1 and self._times[tail % size] < horizon:
+                tail += 1
+            self._tail = tail
+            previous = self._times[(head - 1) % size]
+            elapsed = now - self._times[tail % size]
+            if elapsed > 0:
+                raw = (self.position - self._positions[tail % size]) * 1e9 / elapsed
+                # The first velocity after a reset has none before it to smooth
+                # with or to take the acceleration against
+                if head == 1:
+                    velocity = raw
+                else:
+                    velocity = self.smoothing * self.velocity + (1 - self.smoothing) * raw
+                    if now > previous:
+                        raw = (velocity - self.velocity) * 1e9 / (now - previous)
+                        self.acceleration = self.smoothing * self.acceleration + (1 - self.smoothing) * raw
+                self.velocity = velocity
+
+        self._times[head % size] = now
+        self._positions[head % size] = self.position
+        self._head = head + 1
+
+    def samples(self) -> int:
+        return min(self._head, self._size)
+
+    # The wheel counts as stopped once no sample arrived for a whole window
+    def estimate(self, now: Optional[int] = None) -> JogEstimate:
+        if now is None:
+            now = time.monotonic_ns()
+        if not self._head or now - self._times[(self._head - 1) % self._size] > self.window:
+            return JogEstimate(self.position, 0.0, 0.0, 0)
+        velocity = self.velocity
+        return JogEstimate(self.position, velocity, self.acceleration, (velocity > 0) - (velocity < 0))
@@ -1,6 +1,6 @@
 import enum
 
-from .protocol.types import BmdHidJogLed, BmdHidJogMode
+from .protocol.types import BmdHidJogLed, BmdHidJogMode, BmdHidKey
 
 
 class JogMode(enum.IntEnum):
@@ -8,26 +8,44 @@ class JogMode(enum.IntEnum):
     JOG = 0x01
     SCRL = 0x02
 
+    @staticmethod
+    def from_key(key: BmdHidKey):
+        mode = _MODES.get(key)
+        if mode is None:
+            raise Exception("Unknown jog mode: {0}".format(key.name))
+        return mode
+
     @staticmethod
     def leds() -> BmdHidJogLed:
         return BmdHidJogLed.SHTL | BmdHidJogLed.JOG | BmdHidJogLed.SCRL
 
+    @staticmethod
+    def keys() -> list[BmdHidKey]:
+        return [BmdHidKey.SHTL, BmdHidKey.JOG, BmdHidKey.SCRL]
+
     def mode(self) -> BmdHidJogMode:
-        if self == JogMode.SHTL:
-            return BmdHidJogMode.ABSOLUTE
-        elif self == JogMode.JOG:
-            return BmdHidJogMode.RELATIVE
-        elif self == JogMode.SCRL:
-            return BmdHidJogMode.RELATIVE
-        else:
-            raise Exception("Unknown jog mode: {0}".format(self))
+        return _JOG_MODES[self]
 
     def led(self) -> BmdHidJogLed:
-        if self == JogMode.SHTL:
-            return BmdHidJogLed.SHTL
-        elif self == JogMode.JOG:
-            return BmdHidJogLed.JOG
-        elif self == JogMode.SCRL:
-            return BmdHidJogLed.SCRL
-        else:
-            raise Exception("Unknown jog mode: {0}".format(self))
+        return _LEDS[self]
+
+    def key(self) -> BmdHidKey:
+        return _KEYS[self]
+
+
+_JOG_MODES = {
+    JogMode.SHTL: BmdHidJogMode.ABSOLUTE,
+    JogMode.JOG: BmdHidJogMode.RELATIVE,
+    JogMode.SCRL: BmdHidJogMode.RELATIVE,
+}
+_LEDS = {
+    JogMode.SHTL: BmdHidJogLed.SHTL,
+    JogMode.JOG: BmdHidJogLed.JOG,
+    JogMode.SCRL: BmdHidJogLed.SCRL,
+}
+_KEYS = {
+    JogMode.SHTL: BmdHidKey.SHTL,
+    JogMode.JOG: BmdHidKey.JOG,
+    JogMode.SCRL: BmdHidKey.SCRL,
+}
+_MODES = {key: mode for mode, key in _KEYS.items()}
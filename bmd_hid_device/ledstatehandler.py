@@ -1,11 +1,17 @@
-from typing import Callable
+import time
+from typing import Callable, Optional
 
 from .protocol.types import BmdHidLed, BmdHidJogLed
 
 
+# Tracks the LED state last sent to the device and only writes bitfields that
+# actually differ from it. With max_rate set, writes are limited to that many
+# frames per second; changes in between are held back and the most recent
+# state is written once the next frame is due, see next_deadline/service.
 class LedStateHandler:
     on_update_system: Callable[[BmdHidLed], None]
     on_update_jog: Callable[[BmdHidJogLed], None]
+    max_rate: Optional[float]
 
     batch_refs: int = 0
 
@@ -15,9 +21,24 @@ class LedStateHandler:
     system: BmdHidLed
     jog: BmdHidJogLed
 
-    def __init__(self, on_update_system, on_update_jog):
+    sent_system: Optional[BmdHidLed]
+    sent_jog: Optional[BmdHidJogLed]
+    writes_requested: int
+    writes_issued: int
+
+    _next_frame: int
+
+    def __init__(self, on_update_system, on_update_jog, max_rate: Optional[float] = None):
         self.on_update_system = on_update_system
         self.on_update_jog = on_update_jog
+        self.max_rate = max_rate
+        self.system = BmdHidLed(0)
+        self.jog = BmdHidJogLed(0)
+        self.sent_system = None
+        self.sent_jog = None
+        self.writes_requested = 0
+        self.writes_issued = 0
+        self._next_frame = 0
 
     def __enter__(self):
         self.batch_refs += 1
@@ -25,48 +46,104 @@ class LedStateHandler:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.batch_refs -= 1
-        if self.system_changed:
-            self.on_update_system(self.system)
-        if self.jog_changed:
-            self.on_update_jog(self.jog)
+        self._handle_changes()
+
+    def _pending(self) -> bool:
+        return self.system_changed or self.jog_changed
+
+    # Requested writes that were dropped because nothing changed or because a
+    # newer state replaced them before the next frame
+    @property
+    def writes_suppressed(self) -> int:
+        return self.writes_requested - self.writes_issued - self.system_changed - self.jog_changed
 
     def _handle_changes(self):
-        if self.batch_refs == 0:
-            if self.system_changed:
+        if self.batch_refs == 0 and self._pending():
+            self.flush()
+
+    # Each change requests a write, unless one is already pending for that
+    # bitfield and the change just becomes part of it
+    def _mark_system(self):
+        if not self.system_changed:
+            self.system_changed = True
+            self.writes_requested += 1
+
+    def _mark_jog(self):
+        if not self.jog_changed:
+            self.jog_changed = True
+            self.writes_requested += 1
+
+    def flush(self, now: Optional[int] = None, force: bool = False):
+        if now is None:
+            now = time.monotonic_ns()
+        if not force and now < self._next_frame:
+            return
+        wrote = False
+        # A failed write leaves the change pending and the sent state as is
+        if self.system_changed:
+            if self.system != self.sent_system:
                 self.on_update_system(self.system)
-            if self.jog_changed:
+                self.sent_system = self.system
+                self.writes_issued += 1
+                wrote = True
+            self.system_changed = False
+        if self.jog_changed:
+            if self.jog != self.sent_jog:
                 self.on_update_jog(self.jog)
+                self.sent_jog = self.jog
+                self.writes_issued += 1
+                wrote = True
+            self.jog_changed = False
+        if wrote and self.max_rate:
+            self._next_frame = now + int(1_000_000_000 / self.max_rate)
+
+    def next_deadline(self) -> Optional[int]:
+        if self.batch_refs == 0 and self._pending():
+            return self._next_frame
+        return None
+
+    def service(self, now: int):
+        if self.batch_refs == 0 and self._pending():
+            self.flush(now)
 
     def clear(self):
         self.system = BmdHidLed(0)
         self.jog = BmdHidJogLed(0)
-        self.system_changed = True
-        self.jog_changed = True
+        self._mark_system()
+        self._mark_jog()
         self._handle_changes()
 
+    # Forgets what the device shows and writes the full state right away
+    def replay(self):
+        self.sent_system = None
+        self.sent_jog = None
+        self._mark_system()
+        self._mark_jog()
+        self.flush(force=True)
+
     def on(self, led: BmdHidLed | BmdHidJogLed):
         if isinstance(led, BmdHidLed):
             self.system |= led
-            self.system_changed = True
+            self._mark_system()
         if isinstance(led, BmdHidJogLed):
             self.jog |= led
-            self.jog_changed = True
+            self._mark_jog()
         self._handle_changes()
 
     def off(self, led: BmdHidLed | BmdHidJogLed):
         if isinstance(led, BmdHidLed):
             self.system &= ~led
-            self.system_changed = True
+            self._mark_system()
         if isinstance(led, BmdHidJogLed):
             self.jog &= ~led
-            self.jog_changed = True
+            self._mark_jog()
         self._handle_changes()
 
     def update(self, led: BmdHidLed | BmdHidJogLed):
         if isinstance(led, BmdHidLed):
             self.system = led
-            self.system_changed = True
+            self._mark_system()
         if isinstance(led, BmdHidJogLed):
             self.jog = led
-            self.jog_changed = True
+            self._mark_jog()
         self._handle_changes()
@@ -0,0 +1,165 @@
+import concurrent.futures
+import sys
+import time
+from typing import Callable, Optional, NamedTuple, TypeVar, Generic
+
+import hid
+
+from .devices import BmdDevices
+from .hiddevice import BmdHidDevice
+from .rawdevice import BmdRawDevice
+from .util.deviceinfo import HidDeviceInfo
+from .util.timeout import Timeout
+
+T = TypeVar('T')
+
+
+class OpenResult(NamedTuple, Generic[T]):
+    device_info: HidDeviceInfo
+    device: Optional[T]
+    latency: int
+    error: Optional[Exception]
+
+
+def enumerate_devices(device_ids: Optional[list[tuple[int, int]]] = None) -> list[HidDeviceInfo]:
+    device_infos = {}
+    for vendor_id, product_id in (device_ids if device_ids is not None else BmdDevices):
+        for device_info in hid.enumerate(vendor_id, product_id):
+            device_infos.setdefault(device_info["serial_number"], device_info)
+    return list(device_infos.values())
+
+
+def _timed_open(factory: Callable[[HidDeviceInfo], T], device_info: HidDeviceInfo) -> OpenResult[T]:
+    start = time.monotonic_ns()
+    try:
+        device = factory(device_info)
+    except Exception as e:
+        return OpenResult(device_info, None, time.monotonic_ns() - start, e)
+    return OpenResult(device_info, device, time.monotonic_ns() - start, None)
+
+
+# Opens and authenticates all devices concurrently, so start-up takes as long
+# as the slowest handshake instead of the sum of all of them. A failing device
+# is reported in its result and doesn't affect the others. latency is the
+# time spent in factory in ns, i.e. opening the device and the handshake.
+def open_devices(device_infos: list[HidDeviceInfo],
+                 factory: Callable[[HidDeviceInfo], T] = BmdRawDevice,
+                 max_workers: Optional[int] = None) -> list[OpenResult[T]]:
+    if not device_infos:
+        return []
+    with concurrent.futures.ThreadPoolExecutor(max_workers or len(device_infos)) as executor:
+        return list(executor.map(lambda device_info: _timed_open(factory, device_info), device_infos))
+
+
+# Keeps track of attached devices. Enumeration results are cached and only
+# refreshed every scan_interval ms, or every retry_interval ms while a managed
+# device is missing. A device that comes back with a known serial is
+# reconnected in place, which restores its LEDs and jog mode.
+class DeviceManager:
+    factory: Callable[[HidDeviceInfo], BmdHidDevice]
+    device_ids: list[tuple[int, int]]
+    scan_interval: int
+    retry_interval: int
+    on_connect: Optional[Callable[[BmdHidDevice], None]]
+    on_disconnect: Optional[Callable[[BmdHidDevice], None]]
+
+    last_results: list[OpenResult[BmdHidDevice]]
+
+    _attached: dict[str, HidDeviceInfo]
+    _devices: dict[str, BmdHidDevice]
+    _next_scan: Timeout
+
+    def __init__(self,
+                 factory: Callable[[HidDeviceInfo], BmdHidDevice],
+                 device_ids: Optional[list[tuple[int, int]]] = None,
+                 scan_interval: int = 1000,
+                 retry_interval: int = 100,
+                 on_connect: Optional[Callable[[BmdHidDevice], None]] = None,
+                 on_disconnect: Optional[Callable[[BmdHidDevice], None]] = None):
+        self.factory = factory
+        self.device_ids = device_ids if device_ids is not None else BmdDevices
+        self.scan_interval = scan_interval
+        self.retry_interval = retry_interval
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+
+        self.last_results = []
+        self._attached = {}
+        self._devices = {}
+        self._next_scan = Timeout(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        for device in self._devices.values():
+            if not device.isclosed():
+                device.close()
+        self._devices.clear()
+
+    def attached(self) -> dict[str, HidDeviceInfo]:
+        return dict(self._attached)
+
+    def devices(self) -> list[BmdHidDevice]:
+        return [device for device in self._devices.values() if not device.isclosed()]
+
+    def scan(self) -> dict[str, HidDeviceInfo]:
+        attached = {device_info["serial_number"]: device_info for device_info in enumerate_devices(self.device_ids)}
+        self._attached = attached
+        missing = any(device.isclosed() for device in self._devices.values())
+        self._next_scan = Timeout(self.retry_interval if missing else self.scan_interval)
+        return attached
+
+    def check(self):
+        if self._next_scan.remaining():
+            return
+        attached = self.scan()
+        for serial, device in self._devices.items():
+            if serial not in attached and not device.isclosed():
+                device.close()
+                self._disconnected(device)
+        pending = [device_info for serial, device_info in attached.items()
+                   if serial not in self._devices or self._devices[serial].isclosed()]
+        if not pending:
+            return
+        self.last_results = open_devices(pending, self._open)
+        for result in self.last_results:
+            if result.error is not None:
+                print("Could not open device {0}: {1}".format(result.device_info["serial_number"], result.error),
+                      file=sys.stderr)
+            elif self.on_connect is not None:
+                self.on_connect(result.device)
+
+    def _open(self, device_info: HidDeviceInfo) -> BmdHidDevice:
+        device = self._devices.get(device_info["serial_number"])
+        if device is not None:
+            device.reconnect(device_info)
+            return device
+        device = self.factory(device_info)
+        self._devices[device_info["serial_number"]] = device
+        return device
+
+    def _disconnected(self, device: BmdHidDevice):
+        self._next_scan = Timeout(0)
+        if self.on_disconnect is not None:
+            self.on_disconnect(device)
+
+    def poll_available(self):
+        self.check()
+        for device in self.devices():
+            try:
+                device.poll_available()
+            except hid.HIDException:
+                self._disconnected(device)
+
+    def poll_forever(self, interval: int = 1):
+        while True:
+            try:
+                self.poll_available()
+                time.sleep(interval / 1000)
+            except KeyboardInterrupt:
+                print("Thread interrupted via keyboard")
+                break
@@ -0,0 +1,247 @@
+import re
+import struct
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from .events import OnJogEvent, OnKeyEvent, OnBatteryEvent, OnInputEvents
+from .keymask import KEY_CODES
+from .types import BmdHidJogMode
+
+# Offline decoding of captured input reports. The record layouts are derived
+# from the struct layouts of the live decoders, only the field names are
+# added here. Fields named None are padding.
+_FIELDS = {
+    OnJogEvent.id(): ("report_id", "mode", "value", None),
+    OnKeyEvent.id(): ("report_id", "keys"),
+    OnBatteryEvent.id(): ("report_id", "charging", "level"),
+}
+
+_STRUCT_TO_NUMPY = {
+    'B': 'u1', 'b': 'i1', '?': '?',
+    'H': 'u2', 'h': 'i2',
+    'I': 'u4', 'i': 'i4',
+    'Q': 'u8', 'q': 'i8',
+}
+
+
+def layout_dtype(layout: struct.Struct, names: tuple[Optional[str], ...]) -> np.dtype:
+    byteorder, codes = layout.format[0], layout.format[1:]
+    if byteorder not in '<=':
+        raise ValueError("Unsupported layout {0}".format(layout.format))
+    fields = []
+    tokens = re.findall(r'(\d*)([a-zA-Z?])', codes)
+    if len(tokens) != len(names):
+        raise ValueError("Layout {0} does not match fields {1}".format(layout.format, names))
+    for i, ((count, code), name) in enumerate(zip(tokens, names)):
+        name = name or "_pad{0}".format(i)
+        dtype = '<' + _STRUCT_TO_NUMPY[code]
+        fields.append((name, dtype, (int(count),)) if count else (name, dtype))
+    dtype = np.dtype(fields)
+    if dtype.itemsize != layout.size:
+        raise ValueError("Layout {0} is not packed".format(layout.format))
+    return dtype
+
+
+_DTYPES = {report_id: layout_dtype(OnInputEvents[report_id].layout(), names) for report_id, names in _FIELDS.items()}
+_SIZES = [0] * 256
+for _report_id, _event in OnInputEvents.items():
+    _SIZES[_report_id] = _event.layout().size
+
+
+class JogColumns(NamedTuple):
+    index: np.ndarray
+    timestamp: Optional[np.ndarray]
+    mode: np.ndarray
+    value: np.ndarray
+
+
+class KeyColumns(NamedTuple):
+    index: np.ndarray
+    timestamp: Optional[np.ndarray]
+    keys: np.ndarray
+
+
+class BatteryColumns(NamedTuple):
+    index: np.ndarray
+    timestamp: Optional[np.ndarray]
+    charging: np.ndarray
+    level: np.ndarray
+
+
+class DecodedReports(NamedTuple):
+    jog: JogColumns
+    keys: KeyColumns
+    battery: BatteryColumns
+
+
+class KeyIntervals(NamedTuple):
+    key: np.ndarray
+    start: np.ndarray
+    end: np.ndarray
+
+
+class JogDeltas(NamedTuple):
+    delta: np.ndarray
+    dt: np.ndarray
+
+
+# Reports are variable length, so the start offset of each one depends on all
+# the reports before it. The buffer is split into blocks: starting from every
+# position a report entering a block could start at, the reports are followed
+# to the end of the block, all blocks at once. A report of one block then
+# gives the start of the next one, so only one step per block is left to do
+# in Python. Chunks of the buffer are done at a time to bound the memory used.
+_SIZE_TABLE = np.array(_SIZES, dtype=np.int32)
+_MAX_SIZE = max(_SIZES)
+_BLOCK_SHIFT = 9
+_CHUNK = 1 << 20
+
+
+def report_offsets(data: np.ndarray) -> np.ndarray:
+    n = len(data)
+    chunks = []
+    start = 0
+    while start < n:
+        offsets, start = _chunk_offsets(data, start, min(n, start + _CHUNK))
+        chunks.append(offsets)
+        if start > n:
+            raise ValueError("Truncated report at offset {0}".format(offsets[-1]))
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int64)
+
+
+# Offsets of the reports from start up to end, and where the report after
+# them starts
+def _chunk_offsets(data: np.ndarray, start: int, end: int) -> tuple[np.ndarray, int]:
+    chunk = data[start:end]
+    length = end - start
+    heads = (np.arange(0, length, 1 << _BLOCK_SHIFT)[:, None] + np.arange(_MAX_SIZE)).ravel()
+    heads = heads[heads < length]
+    entries = heads[_SIZE_TABLE.take(chunk.take(heads)) > 0]
+    lasts = _follow(chunk, entries)
+    block_last = dict(zip(entries.tolist(), zip(lasts.tolist(), _SIZE_TABLE.take(chunk.take(lasts)).tolist())))
+    starts = []
+    entry = 0
+    while entry < length:
+        last, size = block_last.get(entry, (entry, 0))
+        if size == 0:
+            raise ValueError("Unknown report {0} at offset {1}".format(chunk[last], start + last))
+        starts.append(entry)
+        entry = last + size
+    marks = np.zeros(length, dtype=bool)
+    starts = np.array(starts, dtype=np.int64)
+    marks[starts] = True
+    _follow(chunk, starts, marks)
+    return np.flatnonzero(marks).astype(np.int64) + start, start + entry
+
+
+# Moves every position on by the size of its report until it would leave its
+# block, optionally marking the positions passed. Unknown reports have size 0
+# and so never move on.
+def _follow(chunk: np.ndarray, positions: np.ndarray, marks: Optional[np.ndarray] = None) -> np.ndarray:
+    limits = np.minimum((positions | ((1 << _BLOCK_SHIFT) - 1)) + 1, len(chunk))
+    while True:
+        moved = positions + _SIZE_TABLE.take(chunk.take(positions))
+        moved = np.where(moved < limits, moved, positions)
+        if np.array_equal(moved, positions):
+            return positions
+        if marks is not None:
+            marks[moved] = True
+        positions = moved
+
+
+# Gathers the records one byte column at a time, so the only temporary is one
+# index array the size of offsets
+def _records(data: np.ndarray, offsets: np.ndarray, report_id: int) -> np.ndarray:
+    dtype = _DTYPES[report_id]
+    rows = np.empty((len(offsets), dtype.itemsize), dtype=np.uint8)
+    for column in range(dtype.itemsize):
+        np.take(data, offsets + column, out=rows[:, column])
+    return rows.view(dtype).reshape(len(offsets))
+
+
+def decode_reports(buffer, timestamps: Optional[np.ndarray] = None) -> DecodedReports:
+    data = np.frombuffer(buffer, dtype=np.uint8)
+    offsets = report_offsets(data)
+    if timestamps is not None and len(timestamps) != len(offsets):
+        raise ValueError("Got {0} timestamps for {1} reports".format(len(timestamps), len(offsets)))
+    report_ids = data[offsets]
+    groups = {}
+    for report_id in _FIELDS:
+        index = np.flatnonzero(report_ids == report_id)
+        timestamp = timestamps[index] if timestamps is not None else None
+        groups[report_id] = (index, timestamp, _records(data, offsets[index], report_id))
+
+    index, timestamp, jog = groups[OnJogEvent.id()]
+    jog_columns = JogColumns(index, timestamp, jog["mode"], jog["value"])
+    index, timestamp, keys = groups[OnKeyEvent.id()]
+    key_columns = KeyColumns(index, timestamp, keys["keys"])
+    index, timestamp, battery = groups[OnBatteryEvent.id()]
+    battery_columns = BatteryColumns(index, timestamp, battery["charging"], battery["level"])
+    return DecodedReports(jog_columns, key_columns, battery_columns)
+
+
+def _times(columns: JogColumns | KeyColumns) -> np.ndarray:
+    return columns.timestamp if columns.timestamp is not None else columns.index
+
+
+# Held keys of each report as bitmask, see keymask
+def key_masks(keys: KeyColumns) -> np.ndarray:
+    masks = np.zeros(len(keys.keys), dtype=np.uint64)
+    if len(keys.keys) and int(keys.keys.max()) >= KEY_CODES:
+        raise ValueError("Unknown key {0}".format(int(keys.keys.max())))
+    for column in keys.keys.T:
+        code = column.astype(np.uint64)
+        masks |= np.where(code != 0, np.uint64(1) << code, np.uint64(0))
+    return masks
+
+
+# Intervals during which each key was held, in timestamp units (or report
+# index if no timestamps were captured). Keys still held at the end of the
+# capture end at the last key report. Only the reports at which a key went
+# down or up are looked at for each key.
+def held_intervals(keys: KeyColumns) -> KeyIntervals:
+    count = len(keys.keys)
+    empty = np.zeros(0, dtype=np.int64)
+    if count == 0:
+        return KeyIntervals(empty, empty, empty)
+    times = _times(keys)
+    masks = key_masks(keys)
+    # Transition i is between report i - 1 and report i, with nothing held
+    # before the first and after the last report
+    previous = np.concatenate((np.zeros(1, dtype=np.uint64), masks))
+    current = np.concatenate((masks, np.zeros(1, dtype=np.uint64)))
+    index = np.flatnonzero(previous != current)
+    down = current[index] & ~previous[index]
+    up = previous[index] & ~current[index]
+    del previous, current
+    used = int(np.bitwise_or.reduce(down)) if len(down) else 0
+    key, start, end = [], [], []
+    for code in range(KEY_CODES):
+        if not used & (1 << code):
+            continue
+        bit = np.uint64(1 << code)
+        starts = index[(down & bit) != 0]
+        key.append(np.full(len(starts), code, dtype=np.int64))
+        start.append(starts)
+        end.append(index[(up & bit) != 0])
+    if not key:
+        return KeyIntervals(empty, empty, empty)
+    start = np.concatenate(start)
+    end = np.concatenate(end)
+    return KeyIntervals(np.concatenate(key), times[start], times[np.minimum(end, count - 1)])
+
+
+# Per report wheel movement. Relative modes report the delta directly,
+# absolute modes report the position relative to where the mode was set, so
+# the delta is the difference to the previous report in the same mode.
+def jog_deltas(jog: JogColumns) -> JogDeltas:
+    mode = jog.mode.astype(np.int64)
+    value = jog.value.astype(np.int64)
+    times = _times(jog).astype(np.int64)
+    absolute = (mode == BmdHidJogMode.ABSOLUTE) | (mode == BmdHidJogMode.ABSOLUTE_DEADZONE)
+    same_mode = np.concatenate(([False], mode[1:] == mode[:-1]))
+    previous = np.concatenate(([0], value[:-1]))
+    delta = np.where(absolute, value - np.where(same_mode, previous, 0), value)
+    dt = np.concatenate(([0], np.diff(times)))
+    return JogDeltas(delta, dt)
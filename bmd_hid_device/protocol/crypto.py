@@ -35,6 +35,10 @@ __AUTH_ODD_TBL = [
 __MASK = 0xa79a63f585d37bf0
 
 
+__MASK64 = 0xffffffffffffffff
+__PARITY = [(0x78 >> n) & 1 for n in range(8)]
+
+
 def __rotate(data: int) -> int:
     return ((data << 56) | (data >> 8)) & 0xffffffffffffffff
 
@@ -45,7 +49,8 @@ def __rotate_n(data: int, n: int) -> int:
     return data
 
 
-def solve_challenge(challenge: int) -> int:
+# Straightforward version of the algorithm, kept to verify the faster ones
+def solve_challenge_reference(challenge: int) -> int:
     n = challenge & 7
     v = __rotate_n(challenge, n)
     parity = (v & 1) == ((0x78 >> n) & 1)
@@ -59,3 +64,33 @@ def solve_challenge(challenge: int) -> int:
         k = __AUTH_ODD_TBL[n]
 
     return v ^ (__rotate(v) & __MASK) ^ k
+
+
+# Rotating n times by a byte is a single rotation by 8 * n bits
+def solve_challenge(challenge: int) -> int:
+    n = challenge & 7
+    v = ((challenge >> (n << 3)) | (challenge << (64 - (n << 3)))) & __MASK64
+    if (v & 1) == __PARITY[n]:
+        k = __AUTH_EVEN_TBL[n]
+    else:
+        v ^= ((v >> 8) | (v << 56)) & __MASK64
+        k = __AUTH_ODD_TBL[n]
+    return v ^ (((v >> 8) | (v << 56)) & __MASK) ^ k
+
+
+# Solves an array of challenges at once, requires numpy
+def solve_challenges(challenges):
+    import numpy as np
+
+    c = np.asarray(challenges, dtype=np.uint64)
+    n = c & np.uint64(7)
+    # For n == 0 both shifts are 0 and the rotation is a no-op, as it should be
+    right = n << np.uint64(3)
+    left = (np.uint64(64) - right) & np.uint64(63)
+    v = (c >> right) | (c << left)
+    parity = (v & np.uint64(1)) == np.array(__PARITY, dtype=np.uint64)[n]
+    v = np.where(parity, v, v ^ ((v >> np.uint64(8)) | (v << np.uint64(56))))
+    k = np.where(parity,
+                 np.array(__AUTH_EVEN_TBL, dtype=np.uint64)[n],
+                 np.array(__AUTH_ODD_TBL, dtype=np.uint64)[n])
+    return v ^ (((v >> np.uint64(8)) | (v << np.uint64(56))) & np.uint64(__MASK)) ^ k
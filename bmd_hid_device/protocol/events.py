@@ -1,8 +1,19 @@
 import struct
 from typing import NamedTuple
 
+from .keymask import KEY_MASKS
 from .types import BmdHidJogMode, BmdHidKey
 
+JOG_MODES = {mode.value: mode for mode in BmdHidJogMode}
+_KEYS = {key.value: key for key in BmdHidKey}
+
+_JOG_EVENT = struct.Struct('<BBiB')
+_JOG_EVENT_READ = struct.Struct('<xBix')
+_KEY_EVENT = struct.Struct('<B6H')
+_KEY_EVENT_READ = struct.Struct('<x6H')
+_BATTERY_EVENT = struct.Struct('<B?B')
+_BATTERY_EVENT_READ = struct.Struct('<x2B')
+
 
 class OnJogEvent(NamedTuple):
     mode: BmdHidJogMode
@@ -12,13 +23,24 @@ class OnJogEvent(NamedTuple):
     def id() -> int:
         return 3
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _JOG_EVENT
+
+    @staticmethod
+    def unpack(message: bytes) -> tuple[int, int]:
+        return _JOG_EVENT_READ.unpack_from(message)
+
     @staticmethod
     def read(message: bytes):
-        mode, value = struct.unpack_from('<xBix', message)
-        return OnJogEvent(BmdHidJogMode(mode), value)
+        mode, value = _JOG_EVENT_READ.unpack_from(message)
+        jog_mode = JOG_MODES.get(mode)
+        if jog_mode is None:
+            jog_mode = BmdHidJogMode(mode)
+        return OnJogEvent(jog_mode, value)
 
     def serialize(self):
-        return struct.pack('<BBiB', self.id(), int(self.mode), self.value, 0xff)
+        return _JOG_EVENT.pack(self.id(), int(self.mode), self.value, 0xff)
 
 
 # Key Presses are reported in Input Report ID 4 as an array of 6 LE16 keycodes
@@ -32,16 +54,33 @@ class OnKeyEvent(NamedTuple):
     def id() -> int:
         return 4
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _KEY_EVENT
+
+    @staticmethod
+    def unpack(message: bytes) -> tuple[int, ...]:
+        return _KEY_EVENT_READ.unpack_from(message)
+
+    # Held keys as bitmask, see keymask
+    @staticmethod
+    def mask(message: bytes) -> int:
+        k0, k1, k2, k3, k4, k5 = _KEY_EVENT_READ.unpack_from(message)
+        try:
+            return KEY_MASKS[k0] | KEY_MASKS[k1] | KEY_MASKS[k2] | KEY_MASKS[k3] | KEY_MASKS[k4] | KEY_MASKS[k5]
+        except (IndexError, TypeError):
+            raise ValueError("Unknown key in {0}".format(message.hex()))
+
     @staticmethod
     def read(message: bytes):
-        keys = struct.unpack_from('<x6H', message)
-        return OnKeyEvent([BmdHidKey(key) for key in keys if key != 0])
+        keys = _KEY_EVENT_READ.unpack_from(message)
+        return OnKeyEvent([_KEYS.get(key) or BmdHidKey(key) for key in keys if key != 0])
 
     def serialize(self):
         keys = [0, 0, 0, 0, 0, 0]
         for i in range(0, min(len(self.keys), 6)):
             keys[i] = self.keys[i]
-        return struct.pack('<B6H', self.id(), *keys)
+        return _KEY_EVENT.pack(self.id(), *keys)
 
 
 class OnBatteryEvent(NamedTuple):
@@ -52,13 +91,21 @@ class OnBatteryEvent(NamedTuple):
     def id() -> int:
         return 7
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _BATTERY_EVENT
+
+    @staticmethod
+    def unpack(message: bytes) -> tuple[int, int]:
+        return _BATTERY_EVENT_READ.unpack_from(message)
+
     @staticmethod
     def read(message: bytes):
-        charging, level = struct.unpack_from('<x2B', message)
+        charging, level = _BATTERY_EVENT_READ.unpack_from(message)
         return OnBatteryEvent(charging, level)
 
     def serialize(self):
-        return struct.pack('<B?B', self.id(), self.charging, self.level)
+        return _BATTERY_EVENT.pack(self.id(), self.charging, self.level)
 
 
 OnInputEvent = OnJogEvent | OnKeyEvent | OnBatteryEvent
@@ -67,3 +114,4 @@ OnInputEvents = {
     OnKeyEvent.id(): OnKeyEvent,
     OnBatteryEvent.id(): OnBatteryEvent,
 }
+INPUT_REPORT_SIZE = max(event.layout().size for event in OnInputEvents.values())
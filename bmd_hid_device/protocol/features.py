@@ -3,6 +3,11 @@ from typing import NamedTuple
 
 from .types import BmdHidHandshakeStep
 
+_AUTH = struct.Struct('<BBQ')
+_AUTH_READ = struct.Struct('<xBQ')
+_SERIAL = struct.Struct('<B32s')
+_SERIAL_READ = struct.Struct('<x32s')
+
 
 class AuthFeatureMessage(NamedTuple):
     step: BmdHidHandshakeStep
@@ -12,13 +17,17 @@ class AuthFeatureMessage(NamedTuple):
     def id():
         return 6
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _AUTH
+
     @staticmethod
     def read(message: bytes):
-        step, data = struct.unpack_from('<xBQ', message)
+        step, data = _AUTH_READ.unpack_from(message)
         return AuthFeatureMessage(BmdHidHandshakeStep(step), data)
 
     def serialize(self) -> bytes:
-        return struct.pack('<BBQ', self.id(), int(self.step), self.data)
+        return _AUTH.pack(self.id(), int(self.step), self.data)
 
 
 class SerialFeatureMessage(NamedTuple):
@@ -28,14 +37,18 @@ class SerialFeatureMessage(NamedTuple):
     def id():
         return 8
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _SERIAL
+
     @staticmethod
     def read(message: bytes):
         device_serial: bytes
-        device_serial, = struct.unpack_from('<x32s', message)
+        device_serial, = _SERIAL_READ.unpack_from(message)
         return SerialFeatureMessage(device_serial.decode('ascii'))
 
     def serialize(self) -> bytes:
-        return struct.pack('<B32s', self.id(), self.device_serial.encode('ascii'))
+        return _SERIAL.pack(self.id(), self.device_serial.encode('ascii'))
 
 
 DeviceFeatureMessage = AuthFeatureMessage | SerialFeatureMessage
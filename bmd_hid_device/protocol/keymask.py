@@ -0,0 +1,38 @@
+from typing import Optional
+
+from .types import BmdHidKey
+
+# Held keys as an integer bitmask: keycode n is bit n. All keycodes are below
+# 64, KEY_MASKS maps a raw keycode to its bit, 0x0000 (no key) to 0 and
+# codes that are no BmdHidKey to None.
+KEY_CODES = 64
+KEY_MASKS: list[Optional[int]] = [None] * KEY_CODES
+KEY_MASKS[0] = 0
+_KEYS = [None] * KEY_CODES
+for _key in BmdHidKey:
+    if _key != 0:
+        KEY_MASKS[_key] = 1 << _key
+    _KEYS[_key] = _key
+
+
+def key_mask(*keys: BmdHidKey) -> int:
+    mask = 0
+    for key in keys:
+        mask |= KEY_MASKS[key]
+    return mask
+
+
+def mask_key(bit: int) -> BmdHidKey:
+    key = _KEYS[bit.bit_length() - 1]
+    if key is None:
+        return BmdHidKey(bit.bit_length() - 1)
+    return key
+
+
+def keys_from_mask(mask: int) -> list[BmdHidKey]:
+    keys = []
+    while mask:
+        bit = mask & -mask
+        keys.append(mask_key(bit))
+        mask ^= bit
+    return keys
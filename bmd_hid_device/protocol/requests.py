@@ -3,6 +3,13 @@ from typing import NamedTuple
 
 from .types import BmdHidLed, BmdHidJogMode, BmdHidJogLed
 
+_SET_LED = struct.Struct('<BI')
+_SET_LED_READ = struct.Struct('<xI')
+_SET_JOG_MODE = struct.Struct('<BBiB')
+_SET_JOG_MODE_READ = struct.Struct('<xBix')
+_SET_JOG_LED = struct.Struct('<BB')
+_SET_JOG_LED_READ = struct.Struct('<xB')
+
 
 class SetLedRequest(NamedTuple):
     leds: BmdHidLed
@@ -11,13 +18,17 @@ class SetLedRequest(NamedTuple):
     def id() -> int:
         return 2
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _SET_LED
+
     @staticmethod
     def read(message: bytes):
-        leds, = struct.unpack_from('<xI', message)
+        leds, = _SET_LED_READ.unpack_from(message)
         return SetLedRequest(BmdHidLed(leds))
 
     def serialize(self) -> bytes:
-        return struct.pack('<BI', self.id(), int(self.leds))
+        return _SET_LED.pack(self.id(), int(self.leds))
 
 
 class SetJogModeRequest(NamedTuple):
@@ -28,13 +39,17 @@ class SetJogModeRequest(NamedTuple):
     def id() -> int:
         return 3
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _SET_JOG_MODE
+
     @staticmethod
     def read(message: bytes):
-        mode, value = struct.unpack_from('<xBix', message)
+        mode, value = _SET_JOG_MODE_READ.unpack_from(message)
         return SetJogModeRequest(BmdHidJogMode(mode), value)
 
     def serialize(self) -> bytes:
-        return struct.pack('<BBiB', self.id(), int(self.mode), self.value, 0xff)
+        return _SET_JOG_MODE.pack(self.id(), int(self.mode), self.value, 0xff)
 
 
 class SetJogLedRequest(NamedTuple):
@@ -44,13 +59,17 @@ class SetJogLedRequest(NamedTuple):
     def id() -> int:
         return 4
 
+    @staticmethod
+    def layout() -> struct.Struct:
+        return _SET_JOG_LED
+
     @staticmethod
     def read(message: bytes):
-        leds, = struct.unpack_from('<xB', message)
+        leds, = _SET_JOG_LED_READ.unpack_from(message)
         return SetJogLedRequest(BmdHidJogLed(leds))
 
     def serialize(self) -> bytes:
-        return struct.pack('<BB', self.id(), int(self.leds))
+        return _SET_JOG_LED.pack(self.id(), int(self.leds))
 
 
 SetConfigRequest = SetLedRequest | SetJogModeRequest | SetJogLedRequest
@@ -0,0 +1,128 @@
+import functools
+import operator
+from typing import Callable, Iterable, NamedTuple, Optional
+
+from .cutmode import CutMode
+from .hiddevice import BmdHidDevice
+from .jogmode import JogMode
+from .protocol.keymask import KEY_CODES
+from .protocol.types import BmdHidJogLed, BmdHidJogMode, BmdHidKey, BmdHidLed
+from .subscriptions import Subscription
+
+
+# One choice of a radio group: pressing key selects value and lights led.
+# With jog_mode set, the jog wheel is switched to it as well.
+class RadioOption(NamedTuple):
+    value: object
+    key: BmdHidKey
+    led: BmdHidLed | BmdHidJogLed
+    jog_mode: Optional[BmdHidJogMode] = None
+
+
+# Keys of which exactly one is selected at a time, like the cut mode, jog mode
+# or camera keys. Keys and values are mapped to their option through
+# precomputed tables. A selection turns the LED of the old option off and the
+# new one on within one LedStateHandler batch, so it costs a single LED
+# write, and for jog options the jog mode is sent right before the jog LEDs.
+# on_select is called with the value of every newly selected option.
+class RadioGroup:
+    options: tuple[RadioOption, ...]
+    on_select: Optional[Callable[[object], None]]
+    selected: Optional[RadioOption]
+    leds: BmdHidLed | BmdHidJogLed
+
+    _by_key: list[Optional[RadioOption]]
+    _by_value: dict[object, RadioOption]
+    _device: Optional[BmdHidDevice]
+    _subscription: Optional[Subscription]
+
+    def __init__(self,
+                 options: Iterable[RadioOption],
+                 on_select: Optional[Callable[[object], None]] = None,
+                 selected: Optional[object] = None):
+        self.options = tuple(options)
+        if not self.options:
+            raise Exception("Radio group without options")
+        self.on_select = on_select
+        self.leds = functools.reduce(operator.or_, (option.led for option in self.options))
+        self._by_key = [None] * KEY_CODES
+        self._by_value = {}
+        for option in self.options:
+            self._by_key[option.key] = option
+            self._by_value[option.value] = option
+        self.selected = None if selected is None else self._by_value[selected]
+        self._device = None
+        self._subscription = None
+
+    @property
+    def value(self) -> Optional[object]:
+        return None if self.selected is None else self.selected.value
+
+    def keys(self) -> list[BmdHidKey]:
+        return [option.key for option in self.options]
+
+    # Shows the current selection on the device, or selects the first option
+    def attach(self, device: BmdHidDevice):
+        self.detach()
+        self._device = device
+        self._subscription = device.subscriptions.on_key_down(self.key_down)
+        selected = self.selected or self.options[0]
+        self.selected = None
+        self.select(selected.value)
+
+    def detach(self):
+        if self._device is not None and self._subscription is not None:
+            self._device.subscriptions.unsubscribe(self._subscription)
+        self._device = None
+        self._subscription = None
+
+    def key_down(self, key: BmdHidKey):
+        option = self._by_key[key]
+        if option is not None:
+            self._select(option)
+
+    def select(self, value: object):
+        option = self._by_value.get(value)
+        if option is None:
+            raise Exception("Unknown option: {0}".format(value))
+        self._select(option)
+
+    def _select(self, option: RadioOption):
+        if option is self.selected:
+            return
+        self.selected = option
+        device = self._device
+        if device is not None:
+            with device.leds:
+                if option.jog_mode is not None:
+                    device.set_jog_mode(option.jog_mode)
+                device.leds.off(self.leds)
+                device.leds.on(option.led)
+            if option.jog_mode is not None:
+                # The jog LEDs must not wait for the next LED frame
+                device.leds.flush(force=True)
+        if self.on_select is not None:
+            self.on_select(option.value)
+
+
+_CAMERA_KEYS = tuple(BmdHidKey["CAM{0}".format(camera)] for camera in range(1, 10))
+_CAMERA_LEDS = tuple(BmdHidLed["CAM{0}".format(camera)] for camera in range(1, 10))
+
+
+def cut_mode_group(on_select: Optional[Callable[[CutMode], None]] = None,
+                   selected: Optional[CutMode] = None) -> RadioGroup:
+    return RadioGroup((RadioOption(mode, mode.key(), mode.led()) for mode in CutMode), on_select, selected)
+
+
+def jog_mode_group(on_select: Optional[Callable[[JogMode], None]] = None,
+                   selected: Optional[JogMode] = None) -> RadioGroup:
+    return RadioGroup((RadioOption(mode, mode.key(), mode.led(), mode.mode()) for mode in JogMode),
+                      on_select, selected)
+
+
+# Values are the camera numbers 1 to 9
+def camera_group(on_select: Optional[Callable[[int], None]] = None,
+                 selected: Optional[int] = None) -> RadioGroup:
+    return RadioGroup((RadioOption(camera, key, led)
+                       for camera, (key, led) in enumerate(zip(_CAMERA_KEYS, _CAMERA_LEDS), start=1)),
+                      on_select, selected)
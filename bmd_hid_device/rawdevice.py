@@ -4,18 +4,23 @@ from typing import Optional, Callable
 import hid
 
 from .auth import Authenticator
-from .protocol.events import OnInputEvent, OnInputEvents
+from .protocol.events import OnInputEvent, OnInputEvents, INPUT_REPORT_SIZE
 from .protocol.features import DeviceFeatureMessage, DeviceFeatureMessages
 from .protocol.requests import SetConfigRequest, SetConfigRequests
+from .util.capture import SessionRecorder, RecordKind
 from .util.deviceinfo import HidDeviceInfo
 from .util.messagehandler import MessageHandler
+from .util.stats import DeviceStats
+from .util.transport import HidTransport
 
 
 class BmdRawDevice:
-    dev: Optional[hid.Device]
+    dev: Optional[HidTransport]
     device_info: HidDeviceInfo
     on_close: Optional[Callable[[], None]]
     authenticator: Optional[Authenticator]
+    recorder: Optional[SessionRecorder]
+    _stats: Optional[DeviceStats] = None
 
     on_input_event_handler: MessageHandler[OnInputEvent]
     set_config_request_handler: MessageHandler[SetConfigRequest]
@@ -24,26 +29,40 @@ class BmdRawDevice:
     serial: str
     timeout: int = 0
 
-    def __init__(self, device_info: HidDeviceInfo, on_close: Optional[Callable[[], None]] = None):
+    def __init__(self,
+                 device_info: HidDeviceInfo,
+                 on_close: Optional[Callable[[], None]] = None,
+                 auto_refresh: bool = True,
+                 transport: Optional[HidTransport] = None,
+                 recorder: Optional[SessionRecorder] = None):
         self.dev = None
         self.device_info = device_info
         self.on_close = on_close
         self.authenticator = None
+        self.recorder = recorder
 
         self.on_input_event_handler = MessageHandler(OnInputEvents)
         self.set_config_request_handler = MessageHandler(SetConfigRequests)
         self.device_feature_handler = MessageHandler(DeviceFeatureMessages)
-        try:
-            self.dev = hid.Device(
-                vid=device_info["vendor_id"],
-                pid=device_info["product_id"],
-                serial=device_info["serial_number"]
-            )
-        except hid.HIDException as e:
-            self.close()
-            raise e
+        if transport is not None:
+            self.dev = transport
+        else:
+            try:
+                self.dev = hid.Device(
+                    vid=device_info["vendor_id"],
+                    pid=device_info["product_id"],
+                    serial=device_info["serial_number"]
+                )
+            except hid.HIDException as e:
+                self.close()
+                raise e
         self.authenticator = Authenticator(self.poll_feature, self.send_feature, 2000, self.close)
-        self.authenticator.start()
+        # Without auto_refresh the caller owns re-authentication and has to call
+        # reauthenticate() again before half of the returned timeout has passed
+        if auto_refresh:
+            self.timeout = self.authenticator.start()
+        else:
+            self.timeout = self.authenticator.authenticate()
 
     def __str__(self):
         return "{0} {1}, {2}".format(
@@ -70,14 +89,41 @@ class BmdRawDevice:
         if self.on_close is not None:
             self.on_close()
 
-    def poll(self, timeout: Optional[int] = None) -> Optional[OnInputEvent]:
+    @property
+    def stats(self) -> Optional[DeviceStats]:
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats: Optional[DeviceStats]):
+        self._stats = stats
+        self.on_input_event_handler.stats = stats
+
+    def reauthenticate(self) -> int:
+        if self.isclosed():
+            raise hid.HIDException("device is closed")
+        self.timeout = self.authenticator.authenticate()
+        return self.timeout
+
+    def read_report(self, timeout: Optional[int] = None) -> Optional[bytes]:
         if self.isclosed():
             raise hid.HIDException("device is closed")
         try:
-            data = self.dev.read(4096, timeout=timeout)
+            data = self.dev.read(INPUT_REPORT_SIZE, timeout=timeout)
         except hid.HIDException as e:
             self.close()
             raise e
+        if not data:
+            if self._stats is not None:
+                self._stats.empty_reads += 1
+            return None
+        if self._stats is not None:
+            self._stats.reads += 1
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.INPUT, data)
+        return data
+
+    def poll(self, timeout: Optional[int] = None) -> Optional[OnInputEvent]:
+        data = self.read_report(timeout)
         if data is None:
             return None
         return self.on_input_event_handler.parse(data)
@@ -85,11 +131,16 @@ class BmdRawDevice:
     def send(self, message: SetConfigRequest):
         if self.isclosed():
             raise hid.HIDException("device is closed")
+        data = self.set_config_request_handler.serialize(message)
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.OUTPUT, data)
         try:
-            self.dev.write(self.set_config_request_handler.serialize(message))
+            self.dev.write(data)
         except hid.HIDException as e:
             self.close()
             raise e
+        if self._stats is not None:
+            self._stats.writes += 1
 
     def poll_feature(self):
         if self.isclosed():
@@ -99,15 +150,20 @@ class BmdRawDevice:
         except hid.HIDException as e:
             self.close()
             raise e
-        if data is None:
+        if not data:
             return None
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.FEATURE_IN, data)
         return self.device_feature_handler.parse(data)
 
     def send_feature(self, message: DeviceFeatureMessage):
         if self.isclosed():
             raise hid.HIDException("device is closed")
+        data = self.device_feature_handler.serialize(message)
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.FEATURE_OUT, data)
         try:
-            self.dev.send_feature_report(self.device_feature_handler.serialize(message))
+            self.dev.send_feature_report(data)
         except hid.HIDException as e:
             self.close()
             raise e
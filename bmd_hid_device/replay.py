@@ -0,0 +1,43 @@
+import time
+
+from .hiddevice import BmdHidDevice
+from .jogcoalescer import JogCoalescer
+from .util.capture import SessionReader, RecordKind
+
+
+# Dispatches the recorded input events of a session to a device's callbacks,
+# either paced like the original session (scaled by speed) or as fast as
+# possible. Returns the number of events dispatched. With jog coalescing
+# enabled, jog events are coalesced by their recorded timestamps rather than
+# the time of the replay, and the last window is delivered at the end.
+def replay(reader: SessionReader, device: BmdHidDevice, realtime: bool = True, speed: float = 1.0) -> int:
+    start = None
+    origin = None
+    count = 0
+    recorded = 0
+    live = device._jog_coalescer
+    coalescer = None
+    if live is not None:
+        live.flush()
+        coalescer = JogCoalescer(live.on_flush, live.window / 1_000_000, clock=lambda: recorded)
+        device._jog_coalescer = coalescer
+    try:
+        for timestamp, message in reader.messages(RecordKind.INPUT):
+            if realtime:
+                if origin is None:
+                    origin = timestamp
+                    start = time.monotonic_ns()
+                delay = start + (timestamp - origin) / speed - time.monotonic_ns()
+                if delay > 0:
+                    time.sleep(delay / 1_000_000_000)
+            recorded = timestamp
+            if coalescer is not None:
+                coalescer.service(timestamp)
+            device.dispatch(message)
+            count += 1
+        if coalescer is not None:
+            coalescer.flush(recorded)
+    finally:
+        if live is not None:
+            device._jog_coalescer = live
+    return count
@@ -0,0 +1,161 @@
+import heapq
+import itertools
+import time
+from typing import Callable, Iterable, Optional, Protocol
+
+import hid
+
+from .util.timeout import TimerSource, bounded_timeout
+
+
+class RunLoopDevice(TimerSource, Protocol):
+    def poll(self, timeout: Optional[int] = None) -> bool: ...
+
+    def stop_refresh(self) -> bool: ...
+
+    def reauthenticate(self) -> int: ...
+
+    def timeout(self) -> int: ...
+
+
+class TimerHandle:
+    deadline: int
+    callback: Callable[[], None]
+    cancelled: bool
+
+    def __init__(self, deadline: int, callback: Callable[[], None]):
+        self.deadline = deadline
+        self.callback = callback
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+# Runs devices, their re-authentication and timers added with call_later on
+# the calling thread. Each device's authenticator thread is stopped and its
+# re-authentication becomes a timer of the loop. Read timeouts are cut to the
+# next deadline of the loop or of the device, so the loop neither spins nor
+# oversleeps. hidapi has no handle to wait on several devices at once, so with
+# more than one device the loop checks all of them and then sleeps for at most
+# idle_interval ms. Errors of a device go to on_error, which removes the
+# device; without one they are raised.
+class RunLoop:
+    idle_interval: int
+    on_error: Optional[Callable[[RunLoopDevice, Exception], None]]
+
+    _devices: list[RunLoopDevice]
+    _refresh: dict[int, TimerHandle]
+    _timers: list[tuple[int, int, TimerHandle]]
+    _sequence: itertools.count
+    _running: bool
+
+    def __init__(self,
+                 devices: Iterable[RunLoopDevice] = (),
+                 idle_interval: int = 1,
+                 on_error: Optional[Callable[[RunLoopDevice, Exception], None]] = None):
+        self.idle_interval = idle_interval
+        self.on_error = on_error
+        self._devices = []
+        self._refresh = {}
+        self._timers = []
+        self._sequence = itertools.count()
+        self._running = False
+        for device in devices:
+            self.add(device)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def add(self, device: RunLoopDevice):
+        self._devices.append(device)
+        if device.stop_refresh():
+            self._schedule_refresh(device, device.timeout())
+
+    def remove(self, device: RunLoopDevice):
+        self._devices.remove(device)
+        handle = self._refresh.pop(id(device), None)
+        if handle is not None:
+            handle.cancel()
+
+    def call_at(self, deadline: int, callback: Callable[[], None]) -> TimerHandle:
+        handle = TimerHandle(deadline, callback)
+        heapq.heappush(self._timers, (deadline, next(self._sequence), handle))
+        return handle
+
+    def call_later(self, delay: float, callback: Callable[[], None]) -> TimerHandle:
+        return self.call_at(time.monotonic_ns() + int(delay * 1_000_000), callback)
+
+    def _schedule_refresh(self, device: RunLoopDevice, timeout: int):
+        self._refresh[id(device)] = self.call_later(timeout * 500, lambda: self._reauthenticate(device))
+
+    def _reauthenticate(self, device: RunLoopDevice):
+        try:
+            timeout = device.reauthenticate()
+        except hid.HIDException as e:
+            self._fail(device, e)
+            return
+        self._schedule_refresh(device, timeout)
+
+    def _fail(self, device: RunLoopDevice, e: Exception):
+        if self.on_error is None:
+            raise e
+        self.remove(device)
+        self.on_error(device, e)
+
+    def next_deadline(self) -> Optional[int]:
+        timers = self._timers
+        while timers and timers[0][2].cancelled:
+            heapq.heappop(timers)
+        deadline = timers[0][0] if timers else None
+        if len(self._devices) > 1:
+            for device in self._devices:
+                next_deadline = device.next_deadline()
+                if next_deadline is not None and (deadline is None or next_deadline < deadline):
+                    deadline = next_deadline
+        return deadline
+
+    def _service(self, now: int):
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            _, _, handle = heapq.heappop(timers)
+            if not handle.cancelled:
+                handle.callback()
+
+    def _poll(self, device: RunLoopDevice, timeout: Optional[int]) -> bool:
+        try:
+            return device.poll(timeout)
+        except hid.HIDException as e:
+            self._fail(device, e)
+            return False
+
+    def run_once(self, timeout: Optional[int] = None):
+        timeout = bounded_timeout(timeout, self.next_deadline())
+        if len(self._devices) == 1:
+            # A single device can block in its read, which cuts the timeout
+            # to its own deadlines
+            self._poll(self._devices[0], timeout)
+        elif self._devices:
+            read = False
+            for device in list(self._devices):
+                read |= self._poll(device, 0)
+            if not read and timeout != 0:
+                time.sleep(self.idle_interval / 1000 if timeout is None else min(timeout, self.idle_interval) / 1000)
+        elif timeout is None:
+            raise Exception("Nothing to wait for")
+        elif timeout > 0:
+            time.sleep(timeout / 1000)
+        self._service(time.monotonic_ns())
+
+    def run_forever(self):
+        self._running = True
+        while self._running and (self._devices or self.next_deadline() is not None):
+            try:
+                self.run_once()
+            except KeyboardInterrupt:
+                print("Thread interrupted via keyboard")
+                break
+        self._running = False
+
+    def stop(self):
+        self._running = False
@@ -0,0 +1,278 @@
+import binascii
+import enum
+import sys
+import time
+from typing import Callable, NamedTuple, Optional
+
+from .batch import EventBatch
+from .inputhandler import InputEventHandler
+from .protocol.events import JOG_MODES, OnJogEvent, OnKeyEvent, OnBatteryEvent, OnInputEvent, OnInputEvents
+from .protocol.keymask import KEY_CODES, key_mask
+from .protocol.types import BmdHidJogMode, BmdHidKey
+from .util.stats import DeviceStats
+
+
+class SubscriptionKind(enum.Enum):
+    JOG = 0
+    KEY_DOWN = 1
+    KEY_UP = 2
+    BATTERY = 3
+
+
+class Subscription(NamedTuple):
+    kind: SubscriptionKind
+    handler: Callable
+    key: Optional[BmdHidKey] = None
+    mode: Optional[BmdHidJogMode] = None
+
+
+# Any number of listeners for jog, key and battery events, optionally only for
+# one key or jog mode. Handlers take the same arguments as the BmdHidDevice
+# callbacks. Reports are dispatched through a table indexed by the report ID,
+# which is rebuilt on every (un)subscribe; report types that nobody listens
+# to have no entry and are dropped before anything is decoded. While stats
+# are set, decoding is timed per report type. Handlers are kept in tuples that
+# (un)subscribe replaces rather than changes, so a handler may (un)subscribe
+# while an event is dispatched without affecting that event.
+class EventSubscriptions:
+    input: InputEventHandler
+
+    _jog: dict[Optional[int], tuple[Callable[[BmdHidJogMode, int], None], ...]]
+    _key_down: list[tuple[Callable[[BmdHidKey], None], ...]]
+    _key_up: list[tuple[Callable[[BmdHidKey], None], ...]]
+    # A single entry, so it is replaced the same way as the others
+    _battery: list[tuple[Callable[[bool, int], None], ...]]
+    _reports: list[Optional[Callable[[bytes], None]]]
+    _stats: Optional[DeviceStats]
+
+    def __init__(self):
+        self.input = InputEventHandler(self._on_key_down, self._on_key_up)
+        self._jog = {mode: () for mode in [None, *JOG_MODES]}
+        # Index KEY_CODES holds the listeners for any key
+        self._key_down = [()] * (KEY_CODES + 1)
+        self._key_up = [()] * (KEY_CODES + 1)
+        self._battery = [()]
+        self._reports = [None] * 256
+        self._stats = None
+
+    @property
+    def stats(self) -> Optional[DeviceStats]:
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats: Optional[DeviceStats]):
+        self._stats = stats
+        self._rebuild()
+
+    def subscribe(self,
+                  kind: SubscriptionKind,
+                  handler: Callable,
+                  key: Optional[BmdHidKey] = None,
+                  mode: Optional[BmdHidJogMode] = None) -> Subscription:
+        subscription = Subscription(kind, handler, key, mode)
+        listeners, index = self._listeners(subscription)
+        listeners[index] = (*listeners[index], handler)
+        self._rebuild()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        listeners, index = self._listeners(subscription)
+        handlers = list(listeners[index])
+        handlers.remove(subscription.handler)
+        listeners[index] = tuple(handlers)
+        self._rebuild()
+
+    def on_jog(self, handler: Callable[[BmdHidJogMode, int], None],
+               mode: Optional[BmdHidJogMode] = None) -> Subscription:
+        return self.subscribe(SubscriptionKind.JOG, handler, mode=mode)
+
+    def on_key_down(self, handler: Callable[[BmdHidKey], None], key: Optional[BmdHidKey] = None) -> Subscription:
+        return self.subscribe(SubscriptionKind.KEY_DOWN, handler, key=key)
+
+    def on_key_up(self, handler: Callable[[BmdHidKey], None], key: Optional[BmdHidKey] = None) -> Subscription:
+        return self.subscribe(SubscriptionKind.KEY_UP, handler, key=key)
+
+    def on_battery(self, handler: Callable[[bool, int], None]) -> Subscription:
+        return self.subscribe(SubscriptionKind.BATTERY, handler)
+
+    def wants(self, report_id: int) -> bool:
+        return self._reports[report_id] is not None
+
+    # The container holding the handler tuple of subscription, and its index
+    def _listeners(self, subscription: Subscription) -> tuple[dict | list, Optional[int]]:
+        if subscription.kind == SubscriptionKind.JOG:
+            return self._jog, subscription.mode
+        if subscription.kind == SubscriptionKind.KEY_DOWN:
+            return self._key_down, KEY_CODES if subscription.key is None else subscription.key
+        if subscription.kind == SubscriptionKind.KEY_UP:
+            return self._key_up, KEY_CODES if subscription.key is None else subscription.key
+        if subscription.kind == SubscriptionKind.BATTERY:
+            return self._battery, 0
+        raise Exception("Unknown subscription kind {0}".format(subscription.kind))
+
+    def _rebuild(self):
+        timed = self._stats is not None
+        reports = [None] * 256
+        if any(self._jog.values()):
+            reports[OnJogEvent.id()] = self._timed_jog_report if timed else self._jog_report
+        if any(self._key_down) or any(self._key_up):
+            reports[OnKeyEvent.id()] = self._timed_key_report if timed else self._key_report
+        else:
+            self.input.held_mask = 0
+        if self._battery[0]:
+            reports[OnBatteryEvent.id()] = self._timed_battery_report if timed else self._battery_report
+        self._reports = reports
+
+    def dispatch_report(self, data: bytes) -> bool:
+        handler = self._reports[data[0]]
+        if handler is None:
+            if data[0] not in OnInputEvents:
+                if self._stats is not None:
+                    self._stats.unknown_reports += 1
+                print("Unhandled message {0} {1}"
+                      .format(data[0], binascii.b2a_hex(data).decode('utf-8')),
+                      file=sys.stderr)
+            return False
+        handler(data)
+        return True
+
+    def dispatch(self, message: OnInputEvent) -> bool:
+        if isinstance(message, OnJogEvent):
+            return self.dispatch_jog(message.mode, message.value)
+        elif isinstance(message, OnKeyEvent):
+            return self.dispatch_keys(key_mask(*message.keys))
+        elif isinstance(message, OnBatteryEvent):
+            return self.dispatch_battery(message.charging, message.level)
+        return False
+
+    # Entry points for events that were decoded elsewhere
+    def dispatch_jog(self, mode: BmdHidJogMode, value: int) -> bool:
+        if not self.wants(OnJogEvent.id()):
+            return False
+        self._on_jog(mode, value)
+        return True
+
+    # Jog mode as reported by the device, events in unknown modes are dropped
+    def dispatch_jog_value(self, mode: int, value: int) -> bool:
+        jog_mode = JOG_MODES.get(mode)
+        if jog_mode is None:
+            self._unknown_jog_mode(mode)
+            return False
+        return self.dispatch_jog(jog_mode, value)
+
+    def dispatch_keys(self, mask: int) -> bool:
+        if not self.wants(OnKeyEvent.id()):
+            return False
+        self.input.update_mask(mask)
+        return True
+
+    def dispatch_battery(self, charging: bool, level: int) -> bool:
+        if not self.wants(OnBatteryEvent.id()):
+            return False
+        self._on_battery(charging, level)
+        return True
+
+    # Dispatches rows start to batch.count of an EventBatch like the entry
+    # points above. The report table and jog modes are looked up once for the
+    # whole batch, so subscribing from a handler takes effect with the next
+    # batch. before_other runs ahead of every key or battery event.
+    def dispatch_batch(self, batch: EventBatch, start: int = 0,
+                       before_other: Optional[Callable[[], None]] = None):
+        reports = self._reports
+        jog_id = OnJogEvent.id()
+        key_id = OnKeyEvent.id()
+        wants_jog = reports[jog_id] is not None
+        wants_keys = reports[key_id] is not None
+        wants_battery = reports[OnBatteryEvent.id()] is not None
+        jog_modes = JOG_MODES
+        jog = self._jog
+        update_mask = self.input.update_mask
+        stats = self._stats
+        report_ids = batch.report_id
+        for i in range(start, batch.count):
+            report_id = report_ids[i]
+            if report_id == jog_id:
+                if wants_jog:
+                    mode = jog_modes.get(batch.jog_mode[i])
+                    if mode is None:
+                        self._unknown_jog_mode(batch.jog_mode[i])
+                    else:
+                        value = batch.jog_value[i]
+                        for handler in jog[mode]:
+                            handler(mode, value)
+                        for handler in jog[None]:
+                            handler(mode, value)
+            else:
+                if before_other is not None:
+                    before_other()
+                if report_id == key_id:
+                    if wants_keys:
+                        update_mask(batch.key_mask[i])
+                elif wants_battery:
+                    self._on_battery(bool(batch.battery_charging[i]), batch.battery_level[i])
+            if stats is not None:
+                stats.dispatched(report_id, batch.timestamp[i], time.monotonic_ns())
+
+    @staticmethod
+    def _unknown_jog_mode(mode: int):
+        print("Unknown jog mode {0}".format(mode), file=sys.stderr)
+
+    def _jog_report(self, data: bytes):
+        mode, value = OnJogEvent.unpack(data)
+        jog_mode = JOG_MODES.get(mode)
+        if jog_mode is None:
+            self._unknown_jog_mode(mode)
+            return
+        self._on_jog(jog_mode, value)
+
+    def _key_report(self, data: bytes):
+        self.input.update_mask(OnKeyEvent.mask(data))
+
+    def _battery_report(self, data: bytes):
+        charging, level = OnBatteryEvent.unpack(data)
+        self._on_battery(bool(charging), level)
+
+    # Variants of the above that time the decoding
+    def _timed_jog_report(self, data: bytes):
+        started = time.monotonic_ns()
+        mode, value = OnJogEvent.unpack(data)
+        jog_mode = JOG_MODES.get(mode)
+        self._stats.parsed(data[0], started, time.monotonic_ns())
+        if jog_mode is None:
+            self._unknown_jog_mode(mode)
+            return
+        self._on_jog(jog_mode, value)
+
+    def _timed_key_report(self, data: bytes):
+        started = time.monotonic_ns()
+        mask = OnKeyEvent.mask(data)
+        self._stats.parsed(data[0], started, time.monotonic_ns())
+        self.input.update_mask(mask)
+
+    def _timed_battery_report(self, data: bytes):
+        started = time.monotonic_ns()
+        charging, level = OnBatteryEvent.unpack(data)
+        self._stats.parsed(data[0], started, time.monotonic_ns())
+        self._on_battery(bool(charging), level)
+
+    def _on_jog(self, mode: BmdHidJogMode, value: int):
+        for handler in self._jog[mode]:
+            handler(mode, value)
+        for handler in self._jog[None]:
+            handler(mode, value)
+
+    def _on_key_down(self, key: BmdHidKey):
+        for handler in self._key_down[key]:
+            handler(key)
+        for handler in self._key_down[KEY_CODES]:
+            handler(key)
+
+    def _on_key_up(self, key: BmdHidKey):
+        for handler in self._key_up[key]:
+            handler(key)
+        for handler in self._key_up[KEY_CODES]:
+            handler(key)
+
+    def _on_battery(self, charging: bool, level: int):
+        for handler in self._battery[0]:
+            handler(charging, level)
@@ -0,0 +1,118 @@
+import enum
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import NamedTuple, Optional, Iterator, BinaryIO
+
+from ..protocol.events import OnInputEvents
+from ..protocol.features import DeviceFeatureMessages
+from ..protocol.requests import SetConfigRequests
+from .messagehandler import MessageHandler
+
+# A capture file is the magic followed by records of a LE64 monotonic
+# timestamp in ns, the record kind, the report length and the raw report.
+CAPTURE_MAGIC = b'BMDCAP\x00\x01'
+_RECORD_HEADER = struct.Struct('<QBB')
+
+
+class RecordKind(enum.IntEnum):
+    INPUT = 0x00
+    OUTPUT = 0x01
+    FEATURE_OUT = 0x02
+    FEATURE_IN = 0x03
+
+
+class CaptureRecord(NamedTuple):
+    timestamp: int
+    kind: RecordKind
+    data: bytes
+
+
+class SessionRecorder:
+    _file: Optional[BinaryIO]
+    _lock: threading.Lock
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._file = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(CAPTURE_MAGIC)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def record(self, kind: RecordKind, data: bytes):
+        header = _RECORD_HEADER.pack(time.monotonic_ns(), kind, len(data))
+        with self._lock:
+            if self._file is not None:
+                self._file.write(header + data)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SessionReader:
+    _file: BinaryIO
+    _map: Optional[mmap.mmap]
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._map = None
+        else:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map is None or self._map[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+            self.close()
+            raise ValueError("{0} is not a capture file".format(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    # A trailing record that was only partially written is ignored
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        data = self._map
+        offset = len(CAPTURE_MAGIC)
+        end = len(data)
+        while offset + _RECORD_HEADER.size <= end:
+            timestamp, kind, length = _RECORD_HEADER.unpack_from(data, offset)
+            offset += _RECORD_HEADER.size
+            if offset + length > end:
+                return
+            yield CaptureRecord(timestamp, RecordKind(kind), data[offset:offset + length])
+            offset += length
+
+    def messages(self, kind: RecordKind = RecordKind.INPUT) -> Iterator[tuple[int, object]]:
+        if kind == RecordKind.INPUT:
+            handler = MessageHandler(OnInputEvents)
+        elif kind == RecordKind.OUTPUT:
+            handler = MessageHandler(SetConfigRequests)
+        else:
+            handler = MessageHandler(DeviceFeatureMessages)
+        for record in self:
+            if record.kind != kind:
+                continue
+            message = handler.parse(record.data)
+            if message is not None:
+                yield record.timestamp, message
@@ -1,7 +1,10 @@
 import binascii
 import sys
+import time
 from typing import Generic, TypeVar, Optional, Callable, Protocol
 
+from .stats import DeviceStats
+
 
 class SupportsSerialize(Protocol):
     def serialize(self) -> bytes: ...
@@ -17,19 +20,30 @@ class MessageHandler(Generic[T]):
     types: dict[int, T]
     serializers: dict[T, Callable[[T], bytes]]
 
+    # Parsing is only timed while stats are set
+    stats: Optional[DeviceStats] = None
+
     def __init__(self, types):
         self.types = types
 
     def parse(self, data: bytes) -> Optional[T]:
         if len(data) == 0:
             return None
-        message_id = data[0]
-        if message_id not in self.types:
+        if self.stats is None:
+            return self._read(data)
+        started = time.monotonic_ns()
+        message = self._read(data)
+        self.stats.parsed(data[0], started, time.monotonic_ns())
+        return message
+
+    def _read(self, data: bytes) -> Optional[T]:
+        message_type = self.types.get(data[0])
+        if message_type is None:
             print("Unhandled message {0} {1}"
-                  .format(message_id, binascii.b2a_hex(data).decode('utf-8')),
+                  .format(data[0], binascii.b2a_hex(data).decode('utf-8')),
                   file=sys.stderr)
             return None
-        return self.types[message_id].read(data)
+        return message_type.read(data)
 
     def serialize(self, message: T) -> bytes:
         return message.serialize()
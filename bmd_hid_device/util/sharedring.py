@@ -0,0 +1,91 @@
+import struct
+from typing import NamedTuple, Optional
+
+# The ring header holds the LE64 write and read counters, the count of records
+# dropped because the ring was full and a closed flag, followed by capacity
+# slots of a LE64 sequence number, a LE64 timestamp, the payload length and
+# the payload itself.
+_RING_HEADER = struct.Struct('<QQQB7x')
+_SLOT_HEADER = struct.Struct('<QQB')
+_WRITTEN = 0
+_READ = 8
+_LOST = 16
+_CLOSED = 24
+_COUNTER = struct.Struct('<Q')
+
+
+class RingRecord(NamedTuple):
+    sequence: int
+    timestamp: int
+    data: bytes
+
+
+# Fixed-size ring over a shared buffer for exactly one producer and one consumer,
+# each of which only ever advances its own counter. Records are never
+# overwritten: when the ring is full, push drops the new record and counts it
+# as lost, so the consumer sees a gap in the sequence numbers.
+class SharedRing:
+    capacity: int
+    payload: int
+
+    _buffer: memoryview
+    _slot: int
+
+    def __init__(self, buffer: memoryview, capacity: int, payload: int):
+        self.capacity = capacity
+        self.payload = payload
+        self._slot = _SLOT_HEADER.size + payload
+        if len(buffer) < SharedRing.size(capacity, payload):
+            raise ValueError("Buffer too small for {0} slots of {1} bytes".format(capacity, payload))
+        self._buffer = buffer[:SharedRing.size(capacity, payload)]
+
+    @staticmethod
+    def size(capacity: int, payload: int) -> int:
+        return _RING_HEADER.size + capacity * (_SLOT_HEADER.size + payload)
+
+    def _counter(self, offset: int) -> int:
+        return _COUNTER.unpack_from(self._buffer, offset)[0]
+
+    @property
+    def lost(self) -> int:
+        return self._counter(_LOST)
+
+    @property
+    def closed(self) -> bool:
+        return self._buffer[_CLOSED] != 0
+
+    def close(self):
+        self._buffer[_CLOSED] = 1
+
+    def __len__(self):
+        return self._counter(_WRITTEN) - self._counter(_READ)
+
+    def push(self, data: bytes, timestamp: int) -> bool:
+        if len(data) > self.payload:
+            raise ValueError("Record of {0} bytes exceeds the slot size {1}".format(len(data), self.payload))
+        written = self._counter(_WRITTEN)
+        lost = self._counter(_LOST)
+        if written - self._counter(_READ) >= self.capacity:
+            _COUNTER.pack_into(self._buffer, _LOST, lost + 1)
+            return False
+        offset = _RING_HEADER.size + (written % self.capacity) * self._slot
+        _SLOT_HEADER.pack_into(self._buffer, offset, written + lost, timestamp, len(data))
+        start = offset + _SLOT_HEADER.size
+        self._buffer[start:start + len(data)] = data
+        # Publish the slot only once it is complete
+        _COUNTER.pack_into(self._buffer, _WRITTEN, written + 1)
+        return True
+
+    def pop(self) -> Optional[RingRecord]:
+        read = self._counter(_READ)
+        if read == self._counter(_WRITTEN):
+            return None
+        offset = _RING_HEADER.size + (read % self.capacity) * self._slot
+        sequence, timestamp, length = _SLOT_HEADER.unpack_from(self._buffer, offset)
+        start = offset + _SLOT_HEADER.size
+        data = bytes(self._buffer[start:start + length])
+        _COUNTER.pack_into(self._buffer, _READ, read + 1)
+        return RingRecord(sequence, timestamp, data)
+
+    def release(self):
+        self._buffer.release()
@@ -0,0 +1,159 @@
+import time
+from array import array
+from typing import Callable, NamedTuple, Optional
+
+from ..protocol.events import OnInputEvents
+
+# Bucket n counts durations of n significant bits, i.e. [2^(n-1), 2^n) ns
+HISTOGRAM_BUCKETS = 64
+
+
+class HistogramSnapshot(NamedTuple):
+    count: int
+    total: int
+    min: Optional[int]
+    max: Optional[int]
+    buckets: tuple[int, ...]
+
+    def mean(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return self.total / self.count
+
+    # Upper bound of the bucket the percentile falls into, in ns
+    def percentile(self, p: float) -> Optional[int]:
+        if self.count == 0:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(1 << bucket, self.max)
+        return self.max
+
+
+class LatencyHistogram:
+    count: int
+    total: int
+    min: Optional[int]
+    max: Optional[int]
+
+    _buckets: array
+
+    def __init__(self):
+        self._buckets = array('Q', bytes(8 * HISTOGRAM_BUCKETS))
+        self.reset()
+
+    def reset(self):
+        for i in range(HISTOGRAM_BUCKETS):
+            self._buckets[i] = 0
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, duration: int):
+        self._buckets[min(duration.bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += duration
+        if self.min is None or duration < self.min:
+            self.min = duration
+        if self.max is None or duration > self.max:
+            self.max = duration
+
+    def snapshot(self) -> HistogramSnapshot:
+        return HistogramSnapshot(self.count, self.total, self.min, self.max, tuple(self._buckets))
+
+
+class StatsSnapshot(NamedTuple):
+    timestamp: int
+    reads: int
+    empty_reads: int
+    unknown_reports: int
+    writes: int
+    # Time spent decoding reports, per event type
+    parse: dict[str, HistogramSnapshot]
+    # Time from read_report returning to all callbacks having run, per event type
+    dispatch: dict[str, HistogramSnapshot]
+
+
+# Counters and latency histograms of one device. Histograms are allocated up
+# front for every known input report, so memory use stays fixed. Devices only
+# touch it while it is enabled, with on_export and export_interval (ms) set
+# it also acts as a TimerSource that periodically hands out snapshots.
+class DeviceStats:
+    reads: int
+    empty_reads: int
+    unknown_reports: int
+    writes: int
+    on_export: Optional[Callable[[StatsSnapshot], None]]
+    export_interval: Optional[int]
+
+    _parse: dict[int, LatencyHistogram]
+    _dispatch: dict[int, LatencyHistogram]
+    _next_export: Optional[int]
+
+    def __init__(self,
+                 on_export: Optional[Callable[[StatsSnapshot], None]] = None,
+                 export_interval: Optional[int] = None):
+        self.on_export = on_export
+        self.export_interval = export_interval
+        self._parse = {report_id: LatencyHistogram() for report_id in OnInputEvents}
+        self._dispatch = {report_id: LatencyHistogram() for report_id in OnInputEvents}
+        self.reset()
+
+    def reset(self):
+        self.reads = 0
+        self.empty_reads = 0
+        self.unknown_reports = 0
+        self.writes = 0
+        for histogram in self._parse.values():
+            histogram.reset()
+        for histogram in self._dispatch.values():
+            histogram.reset()
+        self._schedule_export(time.monotonic_ns())
+
+    def parsed(self, report_id: int, started: int, finished: int):
+        histogram = self._parse.get(report_id)
+        if histogram is None:
+            self.unknown_reports += 1
+        else:
+            histogram.add(finished - started)
+
+    # Unknown reports are counted where they are decoded, not here
+    def dispatched(self, report_id: int, read: int, finished: int):
+        histogram = self._dispatch.get(report_id)
+        if histogram is not None:
+            histogram.add(finished - read)
+
+    def snapshot(self) -> StatsSnapshot:
+        return StatsSnapshot(
+            time.monotonic_ns(),
+            self.reads,
+            self.empty_reads,
+            self.unknown_reports,
+            self.writes,
+            {OnInputEvents[report_id].__name__: histogram.snapshot()
+             for report_id, histogram in self._parse.items()},
+            {OnInputEvents[report_id].__name__: histogram.snapshot()
+             for report_id, histogram in self._dispatch.items()},
+        )
+
+    def export(self):
+        if self.on_export is not None:
+            self.on_export(self.snapshot())
+
+    def _schedule_export(self, now: int):
+        if self.on_export is None or self.export_interval is None:
+            self._next_export = None
+        else:
+            self._next_export = now + self.export_interval * 1_000_000
+
+    def next_deadline(self) -> Optional[int]:
+        return self._next_export
+
+    def service(self, now: int):
+        if self._next_export is not None and now >= self._next_export:
+            self.export()
+            self._schedule_export(now)
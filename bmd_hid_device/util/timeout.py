@@ -1,5 +1,5 @@
 import time
-from typing import Optional
+from typing import Optional, Protocol
 
 
 class Timeout:
@@ -13,3 +13,18 @@ class Timeout:
 
     def remaining(self) -> int:
         return self.deadline is None or self.deadline > time.monotonic_ns()
+
+
+# Something that needs to be serviced once a point in time has passed, e.g. a
+# pending coalesced event. Deadlines are time.monotonic_ns() values.
+class TimerSource(Protocol):
+    def next_deadline(self) -> Optional[int]: ...
+
+    def service(self, now: int) -> None: ...
+
+
+def bounded_timeout(timeout: Optional[int], deadline: Optional[int]) -> Optional[int]:
+    if deadline is None:
+        return timeout
+    remaining = max((deadline - time.monotonic_ns() + 999_999) // 1_000_000, 0)
+    return remaining if timeout is None else min(timeout, remaining)
@@ -0,0 +1,15 @@
+from typing import Optional, Protocol
+
+
+# The subset of hid.Device that BmdRawDevice uses. Anything implementing it,
+# e.g. the emulator, can stand in for a real device.
+class HidTransport(Protocol):
+    def read(self, size: int, timeout: Optional[int] = None) -> bytes: ...
+
+    def write(self, data: bytes) -> int: ...
+
+    def get_feature_report(self, report_id: int, size: int) -> bytes: ...
+
+    def send_feature_report(self, data: bytes) -> int: ...
+
+    def close(self) -> None: ...
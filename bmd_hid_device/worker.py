@@ -0,0 +1,224 @@
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Optional
+
+import hid
+
+from .protocol.events import OnInputEvent, OnInputEvents, INPUT_REPORT_SIZE
+from .protocol.requests import SetConfigRequest, SetConfigRequests
+from .rawdevice import BmdRawDevice
+from .util.capture import SessionRecorder, RecordKind
+from .util.deviceinfo import HidDeviceInfo
+from .util.messagehandler import MessageHandler
+from .util.sharedring import SharedRing
+from .util.stats import DeviceStats
+
+COMMAND_SIZE = max(request.layout().size for request in SetConfigRequests.values())
+
+
+def _open_raw(device_info: HidDeviceInfo) -> BmdRawDevice:
+    return BmdRawDevice(device_info, auto_refresh=False)
+
+
+def _rings(buffer: memoryview, capacity: int, command_capacity: int) -> tuple[SharedRing, SharedRing]:
+    events = SharedRing(buffer, capacity, INPUT_REPORT_SIZE)
+    commands = SharedRing(buffer[SharedRing.size(capacity, INPUT_REPORT_SIZE):], command_capacity, COMMAND_SIZE)
+    return events, commands
+
+
+def _worker_main(device_info, opener, name, capacity, command_capacity, ready, connection, read_slice):
+    memory = SharedMemory(name=name)
+    events, commands = _rings(memory.buf, capacity, command_capacity)
+    raw = None
+    try:
+        raw = opener(device_info)
+        if raw.authenticator is not None:
+            raw.authenticator.stop()
+        connection.send(("open", raw.timeout))
+        requests = MessageHandler(SetConfigRequests)
+        refresh_deadline = time.monotonic_ns() + raw.timeout * 500_000_000
+        # The parent closes the command ring to stop the worker
+        while not commands.closed:
+            while (command := commands.pop()) is not None:
+                raw.send(requests.parse(command.data))
+            if time.monotonic_ns() >= refresh_deadline:
+                raw.reauthenticate()
+                refresh_deadline = time.monotonic_ns() + raw.timeout * 500_000_000
+            data = raw.read_report(read_slice)
+            if data is not None:
+                events.push(data, time.monotonic_ns())
+                ready.release()
+    except Exception as e:
+        connection.send(("error", "{0}: {1}".format(type(e).__name__, e)))
+    finally:
+        if raw is not None:
+            raw.close()
+        events.close()
+        ready.release()
+        events.release()
+        commands.release()
+        memory.close()
+
+
+# Runs a BmdRawDevice in a child process, so garbage collection and GIL
+# contention in this one can't delay reads, writes or re-authentication. The
+# child hands the raw input reports over through a shared-memory ring and
+# takes commands through a second one; as with ThreadedRawDevice it reads in
+# slices of read_slice ms, which bounds the delay of commands. When the parent
+# falls behind by more than capacity reports, new reports are dropped and
+# counted in lost, sequence has the number of the report last read. Offers
+# the same interface as BmdRawDevice, so it can be passed to BmdHidDevice.
+# The opener runs in the child and has to be picklable.
+class WorkerRawDevice:
+    device_info: HidDeviceInfo
+    timeout: int
+    recorder: Optional[SessionRecorder]
+    sequence: Optional[int]
+    error: Optional[str]
+
+    on_input_event_handler: MessageHandler[OnInputEvent]
+    set_config_request_handler: MessageHandler[SetConfigRequest]
+
+    _stats: Optional[DeviceStats]
+    _memory: Optional[SharedMemory]
+    _events: SharedRing
+    _commands: SharedRing
+    _process: multiprocessing.Process
+
+    def __init__(self,
+                 device_info: HidDeviceInfo,
+                 capacity: int = 1024,
+                 command_capacity: int = 64,
+                 read_slice: int = 5,
+                 opener: Callable[[HidDeviceInfo], BmdRawDevice] = _open_raw):
+        self.device_info = device_info
+        self.timeout = 0
+        self.recorder = None
+        self.sequence = None
+        self.error = None
+        self.on_input_event_handler = MessageHandler(OnInputEvents)
+        self.stats = None
+        self.set_config_request_handler = MessageHandler(SetConfigRequests)
+
+        context = multiprocessing.get_context("spawn")
+        self._memory = SharedMemory(create=True, size=(
+                SharedRing.size(capacity, INPUT_REPORT_SIZE) + SharedRing.size(command_capacity, COMMAND_SIZE)
+        ))
+        self._memory.buf[:] = bytes(self._memory.size)
+        self._events, self._commands = _rings(self._memory.buf, capacity, command_capacity)
+        self._ready = context.Semaphore(0)
+        self._connection, child_connection = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=_worker_main,
+            args=(device_info, opener, self._memory.name, capacity, command_capacity,
+                  self._ready, child_connection, read_slice),
+            name="worker {0}".format(device_info["serial_number"]),
+            daemon=True,
+        )
+        self._process.start()
+        child_connection.close()
+        try:
+            status, value = self._connection.recv()
+        except EOFError:
+            status, value = "error", "worker exited during startup"
+        if status != "open":
+            self.close()
+            raise hid.HIDException(value)
+        self.timeout = value
+
+    def __str__(self):
+        return "{0} {1}, {2} (worker {3})".format(
+            self.device_info["manufacturer_string"],
+            self.device_info["product_string"],
+            self.device_info["serial_number"],
+            self._process.pid
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def stats(self) -> Optional[DeviceStats]:
+        return self._stats
+
+    @stats.setter
+    def stats(self, stats: Optional[DeviceStats]):
+        self._stats = stats
+        self.on_input_event_handler.stats = stats
+
+    @property
+    def lost(self) -> int:
+        return self._events.lost
+
+    def queue_depth(self) -> int:
+        return len(self._events)
+
+    def isclosed(self):
+        return self._memory is None or self._events.closed
+
+    def close(self):
+        if self._memory is None:
+            return
+        self._commands.close()
+        self._process.join()
+        self._collect_error()
+        self._connection.close()
+        self._events.release()
+        self._commands.release()
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+    def _collect_error(self):
+        while self._connection.poll():
+            try:
+                status, value = self._connection.recv()
+            except EOFError:
+                return
+            if status == "error":
+                self.error = value
+
+    def send(self, message: SetConfigRequest):
+        if self.isclosed():
+            raise hid.HIDException("device is closed")
+        data = self.set_config_request_handler.serialize(message)
+        if not self._commands.push(data, time.monotonic_ns()):
+            raise hid.HIDException("write queue is full")
+        if self.recorder is not None:
+            self.recorder.record(RecordKind.OUTPUT, data)
+        if self._stats is not None:
+            self._stats.writes += 1
+
+    def read_report(self, timeout: Optional[int] = None) -> Optional[bytes]:
+        if self._memory is None:
+            raise hid.HIDException("device is closed")
+        deadline = None if timeout is None else time.monotonic() + timeout / 1000
+        while True:
+            record = self._events.pop()
+            if record is not None:
+                self.sequence = record.sequence
+                if self._stats is not None:
+                    self._stats.reads += 1
+                if self.recorder is not None:
+                    self.recorder.record(RecordKind.INPUT, record.data)
+                return record.data
+            if self._events.closed:
+                self._collect_error()
+                raise hid.HIDException(self.error or "device is closed")
+            # The semaphore is released once per report, so it may still hold
+            # permits for reports that were already read
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            if not self._ready.acquire(timeout=remaining) and remaining is not None:
+                if self._stats is not None:
+                    self._stats.empty_reads += 1
+                return None
+
+    def poll(self, timeout: Optional[int] = None) -> Optional[OnInputEvent]:
+        data = self.read_report(timeout)
+        if data is None:
+            return None
+        return self.on_input_event_handler.parse(data)
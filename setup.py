@@ -12,6 +12,7 @@ setup(name=name,
           "Issue tracker": "https://github.com/justjanne/bmd-hid-device/issues",
       },
       install_requires=["hid"],
+      extras_require={"numpy": ["numpy"]},
       packages=find_packages(),
       package_data={'bmd_hid_device': ['py.typed']},
       license="Apache-2.0 license",
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from bmd_hid_device.protocol import columnar
+from bmd_hid_device.protocol.events import OnInputEvents
+
+SIZES = {report_id: event.layout().size for report_id, event in OnInputEvents.items()}
+
+
+# Walks the buffer report by report
+def reference_offsets(data: bytes) -> list[int] | str:
+    offsets = []
+    offset = 0
+    while offset < len(data):
+        if data[offset] not in SIZES:
+            return "Unknown report {0} at offset {1}".format(data[offset], offset)
+        offsets.append(offset)
+        offset += SIZES[data[offset]]
+    if offset > len(data):
+        return "Truncated report at offset {0}".format(offsets[-1])
+    return offsets
+
+
+def reports(rng: random.Random, count: int) -> bytearray:
+    data = bytearray()
+    for _ in range(count):
+        report_id = rng.choice(list(SIZES))
+        data.append(report_id)
+        data += bytes(rng.choice([0, rng.randrange(256), *SIZES]) for _ in range(SIZES[report_id] - 1))
+    return data
+
+
+def offsets(data: bytes) -> list[int] | str:
+    try:
+        return columnar.report_offsets(np.frombuffer(bytes(data), dtype=np.uint8)).tolist()
+    except ValueError as e:
+        return str(e)
+
+
+# Small chunks and blocks, so reports cross their borders
+@pytest.mark.parametrize("chunk, block_shift", [(1 << 20, 9), (100, 3), (64, 5)])
+def test_report_offsets(monkeypatch, chunk: int, block_shift: int):
+    monkeypatch.setattr(columnar, "_CHUNK", chunk)
+    monkeypatch.setattr(columnar, "_BLOCK_SHIFT", block_shift)
+    rng = random.Random(chunk)
+    for _ in range(200):
+        data = reports(rng, rng.randrange(60))
+        if data and rng.random() < 0.2:
+            data = data[:rng.randrange(len(data))]
+        elif data and rng.random() < 0.2:
+            data[rng.randrange(len(data))] = 9
+        assert offsets(data) == reference_offsets(data), data.hex()
@@ -0,0 +1,34 @@
+import random
+
+import pytest
+
+from bmd_hid_device.protocol import crypto
+
+MASK64 = 0xffffffffffffffff
+
+
+# Random challenges plus the edge values for each of the eight rotation cases,
+# which are selected by the low three bits of the challenge
+def challenges(n: int) -> list[int]:
+    rng = random.Random(n)
+    edges = [n, MASK64 & ~7 | n, (1 << 63) | n, 0x0101010101010100 | n]
+    return edges + [rng.getrandbits(61) << 3 | n for _ in range(256)]
+
+
+def test_edge_values():
+    assert crypto.solve_challenge(0) == crypto.solve_challenge_reference(0)
+    assert crypto.solve_challenge(MASK64) == crypto.solve_challenge_reference(MASK64)
+
+
+@pytest.mark.parametrize("n", range(8))
+def test_solve_challenge(n: int):
+    for challenge in challenges(n):
+        assert crypto.solve_challenge(challenge) == crypto.solve_challenge_reference(challenge), hex(challenge)
+
+
+@pytest.mark.parametrize("n", range(8))
+def test_solve_challenges(n: int):
+    np = pytest.importorskip("numpy")
+    batch = challenges(n) + [0, MASK64]
+    responses = crypto.solve_challenges(np.array(batch, dtype=np.uint64))
+    assert [int(response) for response in responses] == [crypto.solve_challenge_reference(c) for c in batch]
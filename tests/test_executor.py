@@ -0,0 +1,47 @@
+import threading
+
+from bmd_hid_device.executor import CallbackExecutor, OverflowPolicy
+from bmd_hid_device.protocol.types import BmdHidJogMode
+
+
+# Fills a queue of the given size while its worker is stuck in a first call,
+# then lets the worker run everything that was queued
+def run_overflow(size: int, submit) -> list[tuple]:
+    calls = []
+    gate = threading.Event()
+    with CallbackExecutor() as executor:
+        callback_queue = executor.queue(size, OverflowPolicy.COALESCE_JOG)
+        callback_queue.submit(gate.wait, ())
+        producer = threading.Thread(target=submit, args=(callback_queue, calls))
+        producer.start()
+        producer.join(0.2)
+        gate.set()
+        producer.join()
+        assert callback_queue.close(5)
+    return calls
+
+
+def test_coalesce_jog_keeps_sum():
+    def submit(callback_queue, calls):
+        on_jog = lambda mode, value: calls.append((mode, value))
+        for _ in range(50):
+            callback_queue.submit(on_jog, (BmdHidJogMode.RELATIVE, 1), True)
+
+    calls = run_overflow(4, submit)
+    assert sum(value for _, value in calls) == 50
+    assert len(calls) < 50
+
+
+def test_coalesce_jog_keeps_key_pairs():
+    def submit(callback_queue, calls):
+        on_jog = lambda mode, value: calls.append(("jog", value))
+        for i in range(20):
+            callback_queue.submit(on_jog, (BmdHidJogMode.RELATIVE, 1), True)
+            callback_queue.submit(lambda key: calls.append(("down", key)), (i,))
+            callback_queue.submit(on_jog, (BmdHidJogMode.RELATIVE, 1), True)
+            callback_queue.submit(lambda key: calls.append(("up", key)), (i,))
+
+    calls = run_overflow(4, submit)
+    keys = [call for call in calls if call[0] != "jog"]
+    assert keys == [(kind, i) for i in range(20) for kind in ("down", "up")]
+    assert sum(value for kind, value in calls if kind == "jog") == 40
@@ -0,0 +1,15 @@
+from bmd_hid_device.jogestimator import JogEstimator
+from bmd_hid_device.protocol.types import BmdHidJogMode
+
+
+# A wheel turning at a steady speed does not accelerate, also not right
+# after a reset or a mode switch
+def test_steady_speed_has_no_acceleration():
+    estimator = JogEstimator()
+    now = 1_000_000_000
+    for mode in (BmdHidJogMode.RELATIVE, BmdHidJogMode.RELATIVE_DEADZONE):
+        for _ in range(8):
+            now += 1_000_000
+            estimator.add(mode, 4, now)
+            assert estimator.acceleration == 0.0
+        assert estimator.velocity == 4000.0